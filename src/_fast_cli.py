@@ -0,0 +1,100 @@
+"""Minimal argparse dispatcher for scripted '--json' invocations.
+
+When NOCTUA_FAST=1 is set, `main` routes the supported '--json' commands here
+before Typer and Rich are imported. Anything this parser doesn't recognize is
+handed back to the full Typer application.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, List
+
+
+class UnsupportedCommandError(Exception):
+    """The arguments are not a command supported by the fast path."""
+
+
+class _Parser(argparse.ArgumentParser):
+    """ArgumentParser that raises instead of printing usage and exiting."""
+
+    def error(self, message: str):
+        """Signal that the arguments should be handled by the Typer application."""
+        raise UnsupportedCommandError(message)
+
+
+def _dump(obj: Any):
+    """Print the JSON representation of a service result to stdout, like the Typer commands."""
+    from _ui import json_default
+
+    json.dump(obj, sys.stdout, default=json_default)
+    sys.stdout.write("\n")
+
+
+def _libraries_check(args: argparse.Namespace):
+    import services.charmcraft as charmcraft
+
+    if not args.minor and not args.major:
+        raise UnsupportedCommandError("at least one of '--minor' or '--major' is required")
+    libraries = charmcraft.outdated_charm_libraries(minor=args.minor, major=args.major)
+    _dump(libraries)
+
+
+def _libraries_print(args: argparse.Namespace):
+    import services.charmcraft as charmcraft
+
+    libraries = charmcraft.local_charm_libraries()
+    _dump(libraries)
+
+
+def _report_ci(args: argparse.Namespace):
+    import services.github as github
+
+    _dump(github.team_ci_status(args.team_name))
+
+
+def _parser() -> _Parser:
+    """Build the parser for the commands supported by the fast path."""
+    parser = _Parser(prog="noctua", add_help=False)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    charm = commands.add_parser("charm", add_help=False)
+    charm_commands = charm.add_subparsers(dest="charm_command", required=True)
+    libraries = charm_commands.add_parser("libraries", add_help=False)
+    libraries_commands = libraries.add_subparsers(dest="libraries_command", required=True)
+    check = libraries_commands.add_parser("check", add_help=False)
+    check.add_argument("--minor", action="store_true")
+    check.add_argument("--major", action="store_true")
+    check.add_argument("--json", action="store_true", required=True)
+    check.set_defaults(handler=_libraries_check)
+    print_ = libraries_commands.add_parser("print", add_help=False)
+    print_.add_argument("--json", action="store_true", required=True)
+    print_.set_defaults(handler=_libraries_print)
+
+    report = commands.add_parser("report", add_help=False)
+    report_commands = report.add_subparsers(dest="report_command", required=True)
+    ci = report_commands.add_parser("ci", add_help=False)
+    ci.add_argument("team_name", nargs="?", default="observability")
+    ci.add_argument("--json", action="store_true", required=True)
+    ci.set_defaults(handler=_report_ci)
+
+    return parser
+
+
+def main(argv: List[str]) -> bool:
+    """Run a supported '--json' command without going through Typer.
+
+    Args:
+        argv: The command line arguments, without the program name.
+
+    Returns:
+        True if the command has been handled, False if it should be run by Typer.
+    """
+    if "--json" not in argv:
+        return False
+    try:
+        args = _parser().parse_args(argv)
+        args.handler(args)
+    except UnsupportedCommandError:
+        return False
+    return True
@@ -0,0 +1,20 @@
+"""Terminal and JSON output shared by the commands and the services."""
+
+import dataclasses
+import functools
+from typing import Any
+
+from rich.console import Console
+
+
+@functools.cache
+def console() -> Console:
+    """Return the console to print to, creating it on first use."""
+    return Console()
+
+
+def json_default(obj: Any) -> Any:
+    """Serialize the dataclasses returned by the services as JSON objects."""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -1,16 +1,15 @@
 """Typer application to run charm-related commands."""
 
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Annotated, Optional
 
 import typer
-from rich.console import Console
 
-import services.charmcraft as charmcraft
+from _ui import console
 from commands.charm_libraries import app as libraries_app
 
 log = logging.getLogger(__name__)
-console = Console()
 
 app = typer.Typer()
 app.add_typer(libraries_app, name="libraries", help="(+) Commands related to charm libraries.")
@@ -43,6 +42,8 @@ def promote(
 
     Example: 'latest/edge' will be promoted to 'latest/beta'.
     """
+    import services.charmcraft as charmcraft
+
     source_channel = charmcraft.CharmChannel(source)
     target_channel = source_channel.next_risk_channel
     if source_channel.risk == "stable":
@@ -73,14 +74,31 @@ def promote_train(
     The revision in 'candidate' will be released to 'stable', 'beta' to 'candidate',
     and 'edge' to 'beta'.
     """
+    import services.charmcraft as charmcraft
+
     # Validate the input
     if "/" in track:
         raise InputError(f"{track} is a channel. Please specify a track (e.g., 'latest').")
     # Execute the promotion train
-    console.print(f"Promotion train for [b]{charm}[/b]")
-    promote(charm, source=f"{track}/candidate", dry_run=dry_run)
-    promote(charm, source=f"{track}/beta", dry_run=dry_run)
-    promote(charm, source=f"{track}/edge", dry_run=dry_run)
+    console().print(f"Promotion train for [b]{charm}[/b]")
+    # Plan all the promotions on the same release status, so they don't depend on each other
+    # (e.g., 'beta' released to 'candidate' can't be picked up by the 'stable' promotion)
+    releases = charmcraft.release_status(charm)
+    promotions = [("candidate", "stable"), ("beta", "candidate"), ("edge", "beta")]
+    with ThreadPoolExecutor(max_workers=len(promotions)) as executor:
+        futures = [
+            executor.submit(
+                charmcraft.promote,
+                charm=charm,
+                source=f"{track}/{source}",
+                target=f"{track}/{target}",
+                dry_run=dry_run,
+                releases=releases,
+            )
+            for source, target in promotions
+        ]
+        for future in as_completed(futures):
+            future.result()
 
 
 @app.command()
@@ -116,6 +134,8 @@ def release(
     ] = False,
 ):
     """Upload and release a local '.charm' file to Charmhub."""
+    import services.charmcraft as charmcraft
+
     charm_name = charm_name or charmcraft.metadata()["name"]
     uploaded_charm = charmcraft.upload(
         charm_name=charm_name, path=charm_path, quiet=format_json, dry_run=dry_run
@@ -139,6 +159,8 @@ def pack(
     ] = "charmcraft.yaml",
 ):
     """Pack a charm from any 'charmcraft.yaml' file."""
+    import services.charmcraft as charmcraft
+
     charmcraft.pack(filename=filename)
 
 
@@ -1,18 +1,15 @@
 """Typer application to run commands related to charm libraries."""
 
-import dataclasses
 import json
+import sys
 from typing import Annotated
 
 import typer
-from rich.console import Console
 
-import services.charmcraft as charmcraft
+from _ui import console, json_default
 
 app = typer.Typer()
 
-console = Console()
-
 
 class InputError(Exception):
     """Exception due to wrong user or file input."""
@@ -27,15 +24,17 @@ def check(
     ] = False,
 ):
     """Check if charm libraries are updated to the latest version."""
+    import services.charmcraft as charmcraft
+
     if not minor and not major:
         raise InputError("You must pass at least one of the '--minor' or '--major' flags.")
     libraries = charmcraft.outdated_charm_libraries(minor=minor, major=major)
     if format_json:
-        libraries_dict = {k: dataclasses.asdict(v) for k, v in libraries.items()}
-        console.print(json.dumps(libraries_dict))
+        json.dump(libraries, sys.stdout, default=json_default)
+        sys.stdout.write("\n")
     else:
         for library in libraries.values():
-            console.print(
+            console().print(
                 f"([i]{library.charm_name}[/i]) [b]{library.library_name}[/b] "
                 f"should be updated to {library.api}.{library.patch}"
             )
@@ -48,13 +47,15 @@ def print(
     ] = False,
 ):
     """Print the charm libraries used by the charm, along with their version."""
+    import services.charmcraft as charmcraft
+
     libraries = charmcraft.local_charm_libraries()
     if format_json:
-        libraries_dict = {k: dataclasses.asdict(v) for k, v in libraries.items()}
-        console.print(json.dumps(libraries_dict))
+        json.dump(libraries, sys.stdout, default=json_default)
+        sys.stdout.write("\n")
     else:
-        console.print("Charm libraries used by the charm:")
-        console.print(libraries)
+        console().print("Charm libraries used by the charm:")
+        console().print(libraries)
 
 
 @app.command()
@@ -65,4 +66,6 @@ def publish(
     ] = False,
 ):
     """Publish all the charm libraries that belong to the charm."""
+    import services.charmcraft as charmcraft
+
     charmcraft.publish_charm_libraries(dry_run)
@@ -1,18 +1,30 @@
 """Typer application to create useful reports."""
 
-import dataclasses
 import json
-from typing import Annotated, List
+import sys
+from typing import Annotated, List, Optional
 
 import typer
-from rich import box
-from rich.console import Console
-from rich.table import Table
 
-import services.github as github
+from _ui import console, json_default
 
 app = typer.Typer()
-console = Console()
+
+
+# Rich markup for the workflow statuses that are rendered the same for every workflow
+STATUS_MARKUP = {
+    "success": "[green]success[/green]",
+    "cancelled": "[yellow]cancelled[/yellow]",
+}
+
+
+def _pretty_status(status: str, url: Optional[str]) -> str:
+    """Return the Rich markup to display a workflow status."""
+    if status in STATUS_MARKUP:
+        return STATUS_MARKUP[status]
+    if status == "failure":
+        return f"[red]failure[/red] ([blue link={url}]link[/blue link])"
+    return f"[i]{status}[/i]"
 
 
 @app.command()
@@ -28,6 +40,10 @@ def ci(
     ] = False,
 ):
     """Print a table with CI status for the specified team under the Canonical org."""
+    from rich import box
+    from rich.table import Table
+
+    import services.github as github
 
     def _add_status_row(table: Table, repo_name: str, workflows: List[github.WorkflowStatus]):
         """Update the passed table with repository status."""
@@ -35,36 +51,23 @@ def ci(
             table.add_row(repo_name, "[dim](no badges)[/dim]")
             return
 
-        status_cell = []
-        for workflow in workflows:
-            match workflow.status:
-                case "success":
-                    pretty_status = "[green]success[/green]"
-                case "failure":
-                    pretty_status = (
-                        f"[red]failure[/red] ([blue link={workflow.url}]link[/blue link])"
-                    )
-                case "cancelled":
-                    pretty_status = "[yellow]cancelled[/yellow]"
-                case _:
-                    pretty_status = f"[i]{workflow.status}[/i]"
-            status_cell.append(f"{workflow.name}: {pretty_status}")
-
-        table.add_row(repo_name, "\n".join(status_cell))
+        status_cell = "\n".join(
+            f"{workflow.name}: {_pretty_status(workflow.status, workflow.url)}"
+            for workflow in workflows
+        )
+        table.add_row(repo_name, status_cell)
 
     ci_status = github.team_ci_status(team_name)
     if format_json:
-        json_ci_status = {}
-        for repo, workflows in ci_status.items():
-            json_ci_status[repo] = [dataclasses.asdict(w) for w in workflows]
-        console.print(json.dumps(json_ci_status))
+        json.dump(ci_status, sys.stdout, default=json_default)
+        sys.stdout.write("\n")
     else:
         table = Table(box=box.SIMPLE, safe_box=True)
         table.add_column("Repository", justify="right", style="bold")
         table.add_column("CI status")
         for repo, workflows in ci_status.items():
             _add_status_row(table, repo_name=repo, workflows=workflows)
-        console.print(table)
+        console().print(table)
 
 
 if __name__ == "__main__":
@@ -1,39 +1,71 @@
 """Typer application to run rock-related commands."""
 
+import functools
 import logging
 import os
 import re
-from typing import Annotated, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Dict, List, Optional, Tuple
 
 import typer
-from rich.console import Console
 
-import services.kubernetes as kubernetes
-import services.rockcraft as rockcraft
+from _ui import console
 
 log = logging.getLogger(__name__)
-console = Console()
 
 app = typer.Typer()
 
+ROCK_FILENAME_REGEX = re.compile(r"(.*/)*(?P<app>.+)_(?P<version>.+)_(?P<arch>.+)\.rock")
+
 
 class InputError(Exception):
     """Exception due to wrong user or file input."""
 
 
+@functools.lru_cache(maxsize=4)
+def _local_tags(cwd: str, mtime_ns: int) -> Dict[str, List[str]]:
+    """Compute the local rock tags, caching them until the directory changes."""
+    import services.rockcraft as rockcraft
+
+    # Only directories can be version folders; skip files without extra stat calls
+    with os.scandir(cwd) as entries:
+        version_folders = [entry.name for entry in entries if entry.is_dir()]
+    return rockcraft.local_tags(version_folders)
+
+
+def local_tags() -> Dict[str, List[str]]:
+    """Return the tags for each rock version in the current working directory."""
+    return _local_tags(os.getcwd(), os.stat(".").st_mtime_ns)
+
+
+def _parse_rock_path(rock_path: str) -> Tuple[str, str, str]:
+    """Parse name, version and architecture from a '<name>_<version>_<arch>.rock' path."""
+    rock_matches = ROCK_FILENAME_REGEX.match(rock_path)
+    if not rock_matches:
+        return "test-rock", "dev", "amd64"
+    return rock_matches.group("app", "version", "arch")
+
+
 @app.command()
 def status(
     rock_name: Annotated[str, typer.Argument(help="Name of a rock built in OCI Factory.")],
 ):
     """Print the diff between local tags and the ones currently in OCI Factory."""
-    locals = rockcraft.local_tags(os.listdir())
-    remote = rockcraft.oci_factory_tags(rock_name=rock_name)
+    import services.rockcraft as rockcraft
+
+    # Fetch the remote tags in the background while scanning the local folders
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        remote_future = executor.submit(rockcraft.oci_factory_tags, rock_name=rock_name)
+        locals = local_tags()
+        remote = remote_future.result()
 
-    only_locals = [v for v in locals.keys() if v not in remote]
+    # Keep the (semantically sorted) local order, checking membership against a set
+    remote_versions = set(remote)
+    only_locals = [v for v in locals.keys() if v not in remote_versions]
     if not only_locals:
-        console.print(f"[b]{rock_name}[/b] is [green]in sync[/green] with OCI Factory.")
+        console().print(f"[b]{rock_name}[/b] is [green]in sync[/green] with OCI Factory.")
     else:
-        console.print(
+        console().print(
             f"[b]{rock_name}[/b] is [red]out of sync[/red]: "
             f"the following versions exist locally, but not on OCI Factory: {only_locals}"
         )
@@ -58,12 +90,12 @@ def run(
     ] = False,
 ):
     """Run a *.rock file in a pod on the local Kubernetes cluster."""
+    import services.kubernetes as kubernetes
+    import services.rockcraft as rockcraft
+
     if not os.path.exists(rock_path):
         raise InputError("The provided rock doesn't exist.")
-    regex = re.compile(r"(.*/)*(?P<app>.+)_(?P<version>.+)_(?P<arch>.+)\.rock")
-    rock_matches = regex.match(rock_path)
-    rock_name = rock_matches.group("app") if rock_matches else "test-rock"
-    rock_tag = rock_matches.group("version") if rock_matches else "dev"
+    rock_name, rock_tag, _ = _parse_rock_path(rock_path)
 
     image_uri = rockcraft.push_to_registry(
         path=rock_path, image_name=rock_name, image_tag=rock_tag
@@ -106,13 +138,12 @@ def test(
     This command expects a 'goss.yaml' in the same folder as the *.rock file,
     to be run from inside the pod. The rock doesn't need to have 'goss' installed.
     """
+    import services.kubernetes as kubernetes
+    import services.rockcraft as rockcraft
+
     if not os.path.exists(rock_path):
         raise InputError("The provided rock doesn't exist.")
-    regex = re.compile(r"(.*/)*(?P<app>.+)_(?P<version>.+)_(?P<arch>.+)\.rock")
-    rock_matches = regex.match(rock_path)
-    rock_name = rock_matches.group("app") if rock_matches else "test-rock"
-    rock_tag = rock_matches.group("version") if rock_matches else "dev"
-    rock_arch = rock_matches.group("arch") if rock_matches else "amd64"
+    rock_name, rock_tag, rock_arch = _parse_rock_path(rock_path)
 
     if not goss_path:
         goss_path = os.path.join(os.path.dirname(os.path.realpath(rock_path)), "goss.yaml")
@@ -156,12 +187,16 @@ def manifest(
     base: Annotated[str, typer.Option(help="Base to append to the tags")] = "22.04",
 ):
     """Generate the 'image.yaml' manifest for OCI Factory."""
+    import services.rockcraft as rockcraft
+
     # Get the tags to apply to each version
-    versions_with_tags = rockcraft.local_tags(os.listdir())
-    selected_versions = {k: v for k, v in versions_with_tags.items() if k in version_list}
-    # Append the -base suffix to the tag
-    for version, tags in selected_versions.items():
-        selected_versions[version] = [f"{t}-{base}" for t in tags]
+    versions_with_tags = local_tags()
+    # Select the requested versions and append the -base suffix to their tags
+    selected_versions = {
+        version: [f"{t}-{base}" for t in tags]
+        for version, tags in versions_with_tags.items()
+        if version in version_list
+    }
     # Validate the rock_repo
     if len(rock_repo.split("/")) != 2:
         raise InputError(
@@ -180,7 +215,8 @@ def manifest(
     manifest = rockcraft.oci_factory_manifest(
         repository=rock_repo, commit=commit_sha, versions_with_tags=selected_versions
     )
-    console.print(manifest)
+    # Print the raw YAML: Rich would highlight, wrap and parse markup in it
+    print(manifest)
 
 
 if __name__ == "__main__":
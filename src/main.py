@@ -1,24 +1,102 @@
 """Main Typer application to assemble the CLI."""
 
-import logging
+import os
+import sys
 
-import typer
-from rich.logging import RichHandler
+# Scripted callers can skip Typer altogether for the commands supporting '--json'
+if os.environ.get("NOCTUA_FAST") == "1":
+    from _fast_cli import main as fast_main
 
-from commands import charm, report, rock
+    if fast_main(sys.argv[1:]):
+        sys.exit(0)
+
+import functools  # noqa: E402
+import importlib  # noqa: E402
+import importlib.metadata  # noqa: E402
+import logging  # noqa: E402
+from typing import Annotated, List, Optional  # noqa: E402
+
+import click  # noqa: E402
+import typer  # noqa: E402
+from typer.core import TyperGroup  # noqa: E402
 
 log = logging.getLogger(__name__)
 
-app = typer.Typer()
-app.add_typer(report.app, name="report")
-app.add_typer(charm.app, name="charm")
-app.add_typer(rock.app, name="rock")
+# Subcommands are imported only when invoked, so each run just pays for the tree it uses;
+# their help is hard-coded so that the top-level '--help' doesn't need to import them
+LAZY_SUBCOMMANDS = {
+    "charm": ("commands.charm", "Commands related to charms."),
+    "report": ("commands.report", "Commands to create useful reports."),
+    "rock": ("commands.rock", "Commands related to rocks."),
+}
+
+
+@functools.cache
+def _load_subcommand(cmd_name: str) -> click.Command:
+    """Import a lazy subcommand and build its Click group, only once per process."""
+    module_name, help_text = LAZY_SUBCOMMANDS[cmd_name]
+    module = importlib.import_module(module_name)
+    command = typer.main.get_group(module.app)
+    command.name = cmd_name
+    command.help = help_text
+    return command
+
+
+class LazyTyperGroup(TyperGroup):
+    """TyperGroup that imports the subcommand modules on first use."""
+
+    _formatting_help = False
+
+    def format_help(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        """Format the help page, listing lazy subcommands without importing them."""
+        self._formatting_help = True
+        try:
+            super().format_help(ctx, formatter)
+        finally:
+            self._formatting_help = False
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        """Return the names of both the eager and the lazy subcommands."""
+        return [*super().list_commands(ctx), *LAZY_SUBCOMMANDS]
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        """Import the module of a lazy subcommand and build its Click group."""
+        if cmd_name not in LAZY_SUBCOMMANDS:
+            return super().get_command(ctx, cmd_name)
+        if self._formatting_help:
+            # Only the name and help are shown in the commands panel
+            return click.Command(cmd_name, help=LAZY_SUBCOMMANDS[cmd_name][1])
+        return _load_subcommand(cmd_name)
+
+
+app = typer.Typer(cls=LazyTyperGroup)
+
+
+def print_version(value: bool):
+    """Print the installed version of Noctua and exit."""
+    if not value:
+        return
+    try:
+        print(importlib.metadata.version("noctua"))
+    except importlib.metadata.PackageNotFoundError:
+        print("unknown (noctua is not installed)")
+    raise typer.Exit()
 
 
 @app.callback()
-def enable_logs(verbose: bool = False):
+def enable_logs(
+    verbose: bool = False,
+    version: Annotated[
+        bool,
+        typer.Option(
+            "--version", callback=print_version, is_eager=True, help="Print the version and exit."
+        ),
+    ] = False,
+):
     """Enable INFO logging."""
     if verbose:
+        from rich.logging import RichHandler
+
         logging.basicConfig(level=logging.INFO, handlers=[RichHandler()])
 
 
@@ -1,17 +1,21 @@
 """Wraps and extend `charmcraft` commands."""
 
+import functools
 import json
+import mmap
 import os
 import re
+import shutil
 import sys
 import tempfile
-from dataclasses import dataclass
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Optional
+from typing import Any, ClassVar, Dict, List, Literal, Mapping, Optional, Tuple, Union
 
 import sh
 import yaml
-from rich.console import Console
 from rich.progress import (
     BarColumn,
     Progress,
@@ -21,8 +25,44 @@ from rich.progress import (
     TimeRemainingColumn,
 )
 
+from _ui import console
+
+try:  # orjson is an optional, faster drop-in for parsing the CLIs' JSON outputs
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 # pyright: reportAttributeAccessIssue=false
 
+# The C-accelerated YAML loader is much faster, but is only available when built with libyaml
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Patterns for the charm library paths and metadata, compiled once at import time
+_LIB_FILE_RE = re.compile(r"^lib/charms/(.+)/v\d+/(.+)\.py")
+_LIB_VERSION_DIR_RE = re.compile(r"v\d+")
+_LIB_META_RE = re.compile(rb"^LIB(API|PATCH)\s*=\s*(\d+)", re.MULTILINE)
+# LIBAPI and LIBPATCH are conventionally declared right after the imports
+_LIB_META_HEAD_SIZE = 4096
+# Revision of an already uploaded charm, from the message of a 'review-error'
+_REVIEW_REVISION_RE = re.compile(r"Revision of the existing package is:\s*(?P<revision>[0-9]+)")
+
+
+def _scan_lib_metadata(
+    contents: Union[bytes, mmap.mmap], truncated: bool = False
+) -> Dict[bytes, bytes]:
+    """Map 'API' and 'PATCH' to the first LIBAPI and LIBPATCH values found in the contents.
+
+    If the contents are `truncated`, a value reaching their end may be cut, so it's ignored.
+    """
+    metadata: Dict[bytes, bytes] = {}
+    for match in _LIB_META_RE.finditer(contents):
+        if truncated and match.end() == len(contents):
+            break
+        metadata.setdefault(match.group(1), match.group(2))
+        if len(metadata) == 2:
+            break
+    return metadata
+
 
 class InputError(Exception):
     """Exception due to wrong user or file input."""
@@ -32,7 +72,7 @@ class CharmhubError(Exception):
     """Triggered by a failure in a Charmhub interaction."""
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class CharmLibrary:
     """Mapping of a Charm library, based on Charmcraft's `list-lib` response object."""
 
@@ -61,19 +101,24 @@ class CharmLibrary:
                 "the path should start with 'lib/'."
             )
 
-        filename_matches = re.compile(r"^lib/charms/(.+)/v\d+/(.+)\.py").match(filename)
+        filename_matches = _LIB_FILE_RE.match(filename)
         if not filename_matches:
             raise InputError(
                 f"Can't parse 'charm_name' and 'library_name' from the path: {filename}"
             )
         charm, library = filename_matches.group(1), filename_matches.group(2)
-        with open(filename, "r") as f:
-            contents = f.read()
-            libapi_matches = re.search(r"LIBAPI = (\d+)", contents)
-            libpatch_matches = re.search(r"LIBPATCH = (\d+)", contents)
-            if not libapi_matches or not libpatch_matches:
-                raise InputError(f"Can't parse LIBAPI and LIBPATCH from the file: {filename}")
-            libapi, libpatch = libapi_matches.group(1), libpatch_matches.group(1)
+        with open(filename, "rb") as f:
+            contents = f.read(_LIB_META_HEAD_SIZE)
+            truncated = len(contents) == _LIB_META_HEAD_SIZE
+            metadata = _scan_lib_metadata(contents, truncated)
+            if len(metadata) < 2 and truncated:
+                # Missing from the head, or possibly cut by its end (i.e., ignored by the
+                # scan): scan the whole file in place, without copying it
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                    metadata = _scan_lib_metadata(mapped_file)
+        if len(metadata) < 2:
+            raise InputError(f"Can't parse LIBAPI and LIBPATCH from the file: {filename}")
+        libapi, libpatch = metadata[b"API"], metadata[b"PATCH"]
 
         return cls(
             charm_name=charm.replace("_", "-"),
@@ -82,11 +127,13 @@ class CharmLibrary:
             patch=int(libpatch),
         )
 
-    @classmethod
-    def from_charmhub(cls, charm_name: str) -> "Dict[str, CharmLibrary]":
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def from_charmhub(charm_name: str) -> "Dict[str, CharmLibrary]":
         """Create a collection of CharmLibrary objects from `charmcraft list-lib`.
 
         The Dict is indexed by the "Charmhub path" (e.g., 'charms.catalogue_k8s.v1.catalogue').
+        The result is cached for each charm, so Charmhub is queried only once per process.
 
         Output from `charmcraft list-lib`:
             [
@@ -100,8 +147,10 @@ class CharmLibrary:
                 }
             ]
         """
-        charmhub_libraries = json.loads(
-            sh.charmcraft("list-lib", charm_name, format="json", _tty_out=False)
+        charmhub_libraries = json_loads(
+            sh.charmcraft(
+                "list-lib", charm_name, format="json", _tty_out=False, _return_cmd=True
+            ).stdout
         )
         libraries = {}
         for item in charmhub_libraries:
@@ -125,18 +174,22 @@ class CharmLibrary:
             charm_name: Name of the charm owning the library.
             library_name: Name of the library (e.g., 'ingress').
         """
-        libraries: "Dict[str, CharmLibrary]" = cls.from_charmhub(charm_name)
-        matching_libraries = [
-            lib for lib in libraries.values() if lib.library_name == library_name
-        ]
-        if not matching_libraries:
-            raise CharmhubError(
-                f"The charm {charm_name} has no library named {library_name} on Charmhub."
-            )
-        return matching_libraries[0]
+        return _library_with_name(cls.from_charmhub(charm_name), charm_name, library_name)
 
 
-@dataclass
+def _library_with_name(
+    libraries: Dict[str, CharmLibrary], charm_name: str, library_name: str
+) -> CharmLibrary:
+    """Return the first library named `library_name` among the Charmhub libraries of a charm."""
+    matching_libraries = [lib for lib in libraries.values() if lib.library_name == library_name]
+    if not matching_libraries:
+        raise CharmhubError(
+            f"The charm {charm_name} has no library named {library_name} on Charmhub."
+        )
+    return matching_libraries[0]
+
+
+@dataclass(slots=True, frozen=True)
 class CharmResource:
     """Helper class to represent a charm resource."""
 
@@ -144,17 +197,21 @@ class CharmResource:
     revision: Optional[int] = None
     upstream_source: Optional[str] = None  # as specified in a charm's metadata
 
-    def __str__(self):
-        """Return a JSON representation of the CharmResource object."""
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the CharmResource as a dictionary, omitting the unset fields."""
         charm_resource: Dict[str, Any] = {"name": self.name}
-        if self.revision:
+        if self.revision is not None:
             charm_resource["revision"] = self.revision
         if self.upstream_source:
             charm_resource["upstream_source"] = self.upstream_source
-        return json.dumps(charm_resource)
+        return charm_resource
+
+    def __str__(self):
+        """Return a JSON representation of the CharmResource object."""
+        return json.dumps(self.to_dict())
 
 
-@dataclass
+@dataclass(slots=True)
 class CharmUpload:
     """Metadata obtained after uploading a charm with `charmcraft upload`."""
 
@@ -168,33 +225,38 @@ class CharmUpload:
             {
                 "name": self.name,
                 "revision": self.revision,
-                "resources": [json.loads(str(r)) for r in self.resources],
+                "resources": [r.to_dict() for r in self.resources],
             }
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class CharmChannel:
     """Helper class representing a release channel (e.g, 'latest/stable')."""
 
     name: str  # full channel namge (e.g. 'latest/stable')
-    _REGEX: re.Pattern[str] = re.compile(r"^(\S+)\/(edge|beta|candidate|stable)$")
+    # Result of parsing the name, computed once; invalid names only fail when accessed
+    _match: Optional[re.Match[str]] = field(init=False, repr=False, compare=False)
+
+    _REGEX: ClassVar[re.Pattern[str]] = re.compile(r"^(\S+)\/(edge|beta|candidate|stable)$")
+
+    def __post_init__(self):
+        """Parse the track and the risk from the channel name."""
+        self._match = self._REGEX.match(self.name)
 
     @property
     def track(self) -> str:
         """Return the track section of a channel."""
-        match = self._REGEX.match(self.name)
-        if match is None:
+        if self._match is None:
             raise InputError(f"Failed to parse track from '{self.name}': not a valid channel")
-        return match.group(1)
+        return self._match.group(1)
 
     @property
     def risk(self) -> str:
         """Return the risk section of a channel."""
-        match = self._REGEX.match(self.name)
-        if match is None:
+        if self._match is None:
             raise InputError(f"Failed to parse risk from '{self.name}': not a valid channel")
-        return match.group(2)
+        return self._match.group(2)
 
     @property
     def next_risk_channel(self) -> "CharmChannel":
@@ -208,7 +270,7 @@ class CharmChannel:
         return CharmChannel(f"{self.track}/{risk_table[self.risk]}")
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ChannelStatus:
     """Release status of a channel (e.g., 'latest/stable').
 
@@ -220,16 +282,16 @@ class ChannelStatus:
     base_version: str
     base_arch: str
     revision: int
-    resources: List[CharmResource]
+    resources: Tuple[CharmResource, ...]
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class BaseStatus:
     """Release status of all the channels for a certain base (e.g., '22.04/amd64')."""
 
     version: str  # Base version (e.g., '22.04')
     arch: str  # Base architecture (e.g., 'amd64')
-    channels: Dict[str, ChannelStatus]  # Map channel names to their release status
+    channels: Mapping[str, ChannelStatus]  # Map channel names to their release status
 
     @property
     def name(self):
@@ -237,7 +299,7 @@ class BaseStatus:
         return f"{self.version}/{self.arch}"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TrackStatus:
     """Release status of all the channels and bases in a track (e.g., 'latest')."""
 
@@ -245,13 +307,12 @@ class TrackStatus:
     bases: Dict[str, BaseStatus]  # Map base names (e.g. '22.04/amd64') to their release status
 
 
-console = Console()
-
-
 def status(charm: str) -> Dict:
     """Return the output of `charmcraft status` as a dictionary."""
-    charmcraft_status = sh.charmcraft.status(charm, format="json", _tty_out=False)
-    return json.loads(charmcraft_status)
+    charmcraft_status = sh.charmcraft.status(
+        charm, format="json", _tty_out=False, _return_cmd=True
+    ).stdout
+    return json_loads(charmcraft_status)
 
 
 def metadata() -> Dict:
@@ -266,8 +327,14 @@ def metadata() -> Dict:
             "Please run the command from the charm folder."
         )
 
-    with open(metadata_file, "r") as f:
-        return yaml.safe_load(f)
+    return _load_metadata(os.path.abspath(metadata_file), os.path.getmtime(metadata_file))
+
+
+@functools.lru_cache(maxsize=4)
+def _load_metadata(path: str, mtime: float) -> Dict:
+    """Parse a charm metadata file, caching the result until the file is modified."""
+    with open(path, "r") as f:
+        return yaml.load(f, Loader=_YAML_LOADER)
 
 
 def release_status(charm: str) -> Dict[str, TrackStatus]:
@@ -291,13 +358,13 @@ def release_status(charm: str) -> Dict[str, TrackStatus]:
                                 base_version='20.04',
                                 base_arch='amd64',
                                 revision=1,
-                                resources=[
+                                resources=(
                                     CharmResource(
                                         name='blackbox-exporter-image',
                                         revision=1,
                                         upstream_source=None
-                                    )
-                                ]
+                                    ),
+                                )
                             ),
                             ...
                         }
@@ -307,34 +374,44 @@ def release_status(charm: str) -> Dict[str, TrackStatus]:
             )
         }
     """
-    charmcraft_status = status(charm)
+    return parse_release_status(status(charm))
+
+
+def parse_release_status(charmcraft_status: List[Dict]) -> Dict[str, TrackStatus]:
+    """Summarize the parsed JSON output of `charmcraft status` (see `release_status`).
+
+    Args:
+        charmcraft_status: The output of `charmcraft status`, as returned by `status`.
+
+    Returns:
+        A map of TrackStatus by the track name.
+    """
     tracks_status: Dict[str, TrackStatus] = {}
     for track_mappings in charmcraft_status:
         bases: Dict[str, BaseStatus] = {}
         # get the track (e.g., 'latest')
         track = track_mappings["track"]
         for mapping in track_mappings["mappings"]:  # for each base
-            channels: Dict[str, ChannelStatus] = {}
             if not mapping["base"]:
                 continue
             base_version = mapping["base"]["channel"]
             base_arch = mapping["base"]["architecture"]
-            for release in mapping["releases"]:  # for each channel
-                resources = release["resources"] or []
-                # get the information the specific channel (e.g, 'latest/edge')
-                channel_status = ChannelStatus(
+            # get the information of each channel (e.g, 'latest/edge')
+            channels = {
+                release["channel"]: ChannelStatus(
                     name=release["channel"],
                     status=release["status"],
                     base_version=base_version,
                     base_arch=base_arch,
                     revision=release["revision"] or -1,
-                    resources=[
+                    resources=tuple(
                         CharmResource(name=res["name"], revision=res["revision"])
-                        for res in resources
-                    ],
+                        for res in release["resources"] or ()
+                    ),
                 )
-                channels[channel_status.name] = channel_status
-            base_status = BaseStatus(version=base_version, arch=base_arch, channels=dict(channels))
+                for release in mapping["releases"]
+            }
+            base_status = BaseStatus(version=base_version, arch=base_arch, channels=channels)
             bases[base_status.name] = base_status
 
         tracks_status[track] = TrackStatus(name=track, bases=bases)
@@ -376,42 +453,39 @@ def upload(
     # Upload the charm
     if dry_run:
         fake_upload = CharmUpload(name=charm_name, revision=0, resources=[])
-        console.print(f"[yellow](dry_run)[/yellow] charmcraft upload {path} --format=json")
-        # console.print(
+        console().print(f"[yellow](dry_run)[/yellow] charmcraft upload {path} --format=json")
+        # console().print(
         #     f"[yellow](dry_run)[/yellow] [b]{charm_name}[/b]: charm uploaded {fake_upload}"
         # )
         return fake_upload
     # `charmcraft upload` output: {"revision": <int>}
     try:
-        output = sh.charmcraft.upload(path, format="json", _tty_out=False)
+        output = sh.charmcraft.upload(path, format="json", _tty_out=False, _return_cmd=True).stdout
     except sh.ErrorReturnCode as e:
         try:
-            errors = json.loads(e.stdout)["errors"]
+            errors = json_loads(e.stdout)["errors"]
         except (json.JSONDecodeError, KeyError):
-            console.print(e.stderr)
+            console().print(e.stderr)
             raise
         else:
             if len(errors) != 1:
-                console.print(e.stderr)
+                console().print(e.stderr)
                 raise
             error = errors[0]
             if error.get("code") != "review-error":
-                console.print(e.stderr)
+                console().print(e.stderr)
                 raise
-            match = re.fullmatch(
-                r".*?Revision of the existing package is: (?P<revision>[0-9]+)",
-                error.get("message", ""),
-            )
+            match = _REVIEW_REVISION_RE.search(error.get("message", ""))
             if not match:
-                console.print(e.stderr)
+                console().print(e.stderr)
                 raise
             revision = int(match.group("revision"))
             if not quiet:
-                console.print(f"Warning: {path=} already uploaded. Using existing {revision=}")
+                console().print(f"Warning: {path=} already uploaded. Using existing {revision=}")
     else:
-        revision: int = json.loads(output)["revision"]
+        revision: int = json_loads(output)["revision"]
         if not quiet:
-            console.print(f"Uploaded charm {revision=}")
+            console().print(f"Uploaded charm {revision=}")
 
     # Upload the resources
     charm_resources = metadata().get("resources", {})  # machine charms have no resources
@@ -421,14 +495,14 @@ def upload(
             "upstream-source"
         ]  # e.g., ubuntu/prometheus:2-22.04
         if dry_run:
-            console.print(
+            console().print(
                 f"[yellow](dry_run)[/yellow] charmcraft upload-resource "
                 f"{charm_name} {resource_name} --image=docker://{upstream_source} "
                 "--format=json"
             )
             continue
         # `upload-resource` output: {"revision": <int>}
-        upload_result = json.loads(
+        upload_result = json_loads(
             sh.charmcraft(
                 "upload-resource",
                 charm_name,
@@ -436,19 +510,20 @@ def upload(
                 image=f"docker://{upstream_source}",
                 format="json",
                 _tty_out=False,
-            )
+                _return_cmd=True,
+            ).stdout
         )
         resource = CharmResource(
             name=resource_name, revision=upload_result["revision"], upstream_source=upstream_source
         )
         uploaded_resources.append(resource)
         if not quiet:
-            console.print(f"[b]{charm_name}[/b]: resource uploaded {resource}")
+            console().print(f"[b]{charm_name}[/b]: resource uploaded {resource}")
 
     # Build the CharmUpload object and return it
     uploaded_charm = CharmUpload(name=charm_name, revision=revision, resources=uploaded_resources)
     if not quiet:
-        console.print(f"[b]{charm_name}[/b]: charm uploaded {uploaded_charm}")
+        console().print(f"[b]{charm_name}[/b]: charm uploaded {uploaded_charm}")
 
     return uploaded_charm
 
@@ -473,7 +548,7 @@ def release(
     """
     resources_args = [f"--resource={r}" for r in resources]
     if dry_run:
-        console.print(
+        console().print(
             f"[yellow](dry run)[/yellow] charmcraft release "
             f"{charm} {' '.join(resources_args)} --channel={channel} "
             f"--revision={revision}"
@@ -483,44 +558,71 @@ def release(
             charm, *resources_args, channel=channel, revision=revision, _tty_out=False
         )
         if not quiet:
-            console.print(f"Released [b]{charm}[/b] {revision} to {channel}")
+            console().print(f"Released [b]{charm}[/b] {revision} to {channel}")
 
 
-def promote(charm: str, source: str, target: str, dry_run: bool = False):
-    """Promote a charm revision from a channel to another one."""
+def promote(
+    charm: str,
+    source: str,
+    target: str,
+    dry_run: bool = False,
+    releases: Optional[Dict[str, TrackStatus]] = None,
+):
+    """Promote a charm revision from a channel to another one.
+
+    Args:
+        charm: The charm name registered in Charmhub.
+        source: The channel to promote the revision from (e.g., 'latest/edge').
+        target: The channel to release the revision to (e.g., 'latest/beta').
+        dry_run: If True only print the promotions without executing them.
+        releases: Release status of the charm, as returned by `release_status`;
+            fetched from Charmhub if not specified.
+    """
     source_channel = CharmChannel(source)
-    releases = release_status(charm)
+    releases = releases or release_status(charm)
     track_status = releases[source_channel.track]
-    # Execute the promotion for all bases in order, starting from the oldest ones
+    promotions = {}
     for base, base_status in track_status.bases.items():
         source_status = base_status.channels[source]
         target_status = base_status.channels[target]
-        if source_status.status == "open" and target_status.status == "open":
+        if source_status.status != "open" or target_status.status != "open":
+            console().print(f"{target} for [b]{charm}[/b] is closed. Skipping promotion.")
+            continue
+        promotions[base] = (source_status, target_status)
+
+    # The releases for different bases are independent, so run them concurrently
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = {}
+        for base, (source_status, target_status) in promotions.items():
             resources_args = [f"--resource={r.name}:{r.revision}" for r in source_status.resources]
             if dry_run:
-                console.print(
+                console().print(
                     f"[yellow](dry run)[/yellow] "
                     f"charmcraft release {charm} {' '.join(resources_args)} "
                     f"--channel={target} --revision={source_status.revision}"
                 )
-                console.print(
+                console().print(
                     f"[yellow](dry run)[/yellow] "
                     f"Promoted [b]{charm}[/b] from {source} ({source_status.revision}) "
                     f"to {target} ({target_status.revision}) ({base})"
                 )
-            else:
-                sh.charmcraft.release(
-                    charm,
-                    *resources_args,
-                    channel=target,
-                    revision=source_status.revision,
-                )
-                console.print(
-                    f"Promoted [b]{charm}[/b] from {source} ({source_status.revision}) "
-                    f"to {target} ({target_status.revision}) ({base})"
-                )
-        else:
-            console.print(f"{target} for [b]{charm}[/b] is closed. Skipping promotion.")
+                continue
+            future = executor.submit(
+                sh.charmcraft.release,
+                charm,
+                *resources_args,
+                channel=target,
+                revision=source_status.revision,
+            )
+            futures[future] = base
+        for future in as_completed(futures):
+            future.result()
+            base = futures[future]
+            source_status, target_status = promotions[base]
+            console().print(
+                f"Promoted [b]{charm}[/b] from {source} ({source_status.revision}) "
+                f"to {target} ({target_status.revision}) ({base})"
+            )
 
 
 def local_charm_libraries() -> Dict[str, CharmLibrary]:
@@ -546,19 +648,13 @@ def local_charm_libraries() -> Dict[str, CharmLibrary]:
         )
 
     libraries = {}
-    # List all the charm libraries
-    for root, _, files in os.walk("lib/charms"):
-        # Avoid __pycache__, similar directories, and dirs with no files
-        charm_library_regex = re.compile(r"^lib/charms/([^/]+)/v(\d+)$")
-        matches = charm_library_regex.match(root)
-        if not matches or not files:
+    # List all the charm libraries; __pycache__ and similar directories never match the pattern
+    for library_path in Path("lib/charms").glob("*/v[0-9]*/*.py"):
+        # The glob also matches folders like 'v1_old' or 'v2.bak', which are not versions
+        if not _LIB_VERSION_DIR_RE.fullmatch(library_path.parent.name):
             continue
-
-        for filename in files:
-            if not filename.endswith(".py"):
-                continue
-            library: CharmLibrary = CharmLibrary.from_file(os.path.join(root, filename))
-            libraries[library.full_name] = library
+        library: CharmLibrary = CharmLibrary.from_file(str(library_path))
+        libraries[library.full_name] = library
 
     return libraries
 
@@ -582,6 +678,8 @@ def outdated_charm_libraries(minor: bool = True, major: bool = True) -> Dict[str
             ...
         }
     """
+    if not minor and not major:  # No update can be reported, so don't query Charmhub at all
+        return {}
     outdated_libraries = {}
     locals = local_charm_libraries()
     progress = Progress(
@@ -590,18 +688,29 @@ def outdated_charm_libraries(minor: bool = True, major: bool = True) -> Dict[str
         TaskProgressColumn(),
         TimeRemainingColumn(),
         SpinnerColumn(spinner_name="line"),
-        TextColumn("{task.fields[library]}"),
+        TextColumn("{task.fields[charm]}"),
         transient=True,
     )
-    progress_task = progress.add_task("Checking", total=len(locals.values()), library="")
-    with progress:
-        for local_library in locals.values():
-            progress.update(progress_task, advance=1, library=local_library.full_name)
-            # Get the info on the version of the charm library on Charmhub
-            charmhub_library = CharmLibrary.from_charmhub_with_name(
-                charm_name=local_library.charm_name, library_name=local_library.library_name
+    # 'charmcraft list-lib' returns all the libraries of a charm, so query each charm only once
+    libraries_by_charm: Dict[str, List[CharmLibrary]] = defaultdict(list)
+    for local_library in locals.values():
+        libraries_by_charm[local_library.charm_name].append(local_library)
+    progress_task = progress.add_task("Checking", total=len(libraries_by_charm), charm="")
+    with progress, ThreadPoolExecutor(max_workers=8) as executor:
+        # Get the info on the version of the charm libraries on Charmhub concurrently
+        futures = {
+            executor.submit(CharmLibrary.from_charmhub, charm_name): charm_name
+            for charm_name in libraries_by_charm
+        }
+        for future in as_completed(futures):
+            progress.update(progress_task, advance=1, charm=futures[future])
+
+    for future, charm_name in futures.items():
+        charmhub_libraries = future.result()
+        for local_library in libraries_by_charm[charm_name]:
+            charmhub_library = _library_with_name(
+                charmhub_libraries, charm_name, local_library.library_name
             )
-
             is_outdated = False
             # If the library has a major update and we are interested
             if local_library.api < charmhub_library.api and major:
@@ -627,22 +736,24 @@ def publish_charm_libraries(dry_run: bool = False):
     charm_name = metadata()["name"]
     libraries = {k: v for k, v in local_charm_libraries().items() if v.charm_name == charm_name}
     if not libraries:
-        console.print(f"[b]{charm_name}[/b] doesn't own any library.")
+        console().print(f"[b]{charm_name}[/b] doesn't own any library.")
     for library in libraries.values():
         if dry_run:
-            console.print(
+            console().print(
                 "[yellow](dry_run)[/yellow] "
                 f"charmcraft publish-lib {library.full_name} --format=json"
             )
-            console.print(
+            console().print(
                 "[yellow](dry_run)[/yellow] "
                 f"[b]v{library.api}/{library.library_name}[/b] patch:{library.patch})"
                 "has been published"
             )
             continue
 
-        result = json.loads(
-            sh.charmcraft("publish-lib", library.full_name, format="json", _tty_out=False)
+        result = json_loads(
+            sh.charmcraft(
+                "publish-lib", library.full_name, format="json", _tty_out=False, _return_cmd=True
+            ).stdout
         )
         # Some versions of Charmcraft return a list, some return a dict
         # Take the first item of the list, because publish-lib supports one library at a time anyway
@@ -652,7 +763,7 @@ def publish_charm_libraries(dry_run: bool = False):
         error_message = result.get("error_message")
         if error_message:
             if "is already updated" in error_message:
-                console.print(f"Library {library.full_name} is already updated in Charmhub.")
+                console().print(f"Library {library.full_name} is already updated in Charmhub.")
                 continue
             if "is the same than in Charmhub but content is different" in error_message:
                 raise CharmhubError(error_message)
@@ -660,7 +771,7 @@ def publish_charm_libraries(dry_run: bool = False):
                 raise CharmhubError(error_message)
             if "has a wrong LIBPATCH number, it's too high" in error_message:
                 raise CharmhubError(error_message)
-        console.print(
+        console().print(
             f"[b]{library.library_name}[/b] v{library.api}.{library.patch} has been published"
         )
 
@@ -677,10 +788,10 @@ def pack(filename: str):
         backup_file = os.path.join(temp_dir, "charmcraft.yaml.bak")
         # Backup charmcraft.yaml if it exists
         if os.path.exists("charmcraft.yaml"):
-            sh.cp("charmcraft.yaml", backup_file)
+            shutil.copy("charmcraft.yaml", backup_file)
         # Use the selected file to pack the charm
         if filename != "charmcraft.yaml":
-            sh.cp(filename, "charmcraft.yaml")
+            shutil.copy(filename, "charmcraft.yaml")
 
         try:
             # Run `charmcraft pack`
@@ -688,7 +799,7 @@ def pack(filename: str):
         finally:
             # Restore the backup charmcraft.yaml if a backup has been created
             if os.path.exists(backup_file):
-                sh.cp(backup_file, "charmcraft.yaml")
+                shutil.copy(backup_file, "charmcraft.yaml")
             # If there was no charmcraft.yaml and we created one, remove it
             elif filename != "charmcraft.yaml":
                 os.unlink("charmcraft.yaml")
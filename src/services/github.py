@@ -1,12 +1,12 @@
 """Wrapper around the GitHub CLI."""
 
-import json
+import os
 import re
-from dataclasses import dataclass
-from typing import Dict, List, Literal, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, List, Literal, Optional, Set, Tuple
 
 import sh
-from rich.console import Console
 from rich.progress import (
     BarColumn,
     Progress,
@@ -16,12 +16,20 @@ from rich.progress import (
     TimeRemainingColumn,
 )
 
+try:  # orjson is an optional, faster drop-in for parsing the CLIs' JSON outputs
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 # pyright: reportAttributeAccessIssue=false
 
-console = Console()
+# Workflow badges in a README, capturing the repository full name and the workflow YAML file
+_BADGE_RE = re.compile(
+    rb"!\[[^\]]*\]\(https://github\.com/([^/]+/[^/]+)/actions/workflows/([^)/]+)/badge\.svg\)"
+)
 
 
-@dataclass
+@dataclass(slots=True)
 class WorkflowStatus:
     """A GitHub workflow."""
 
@@ -49,6 +57,9 @@ class GithubRepo:
     """A GitHub repository wrapper."""
 
     full_name: str
+    # Cached README; not a cached_property, whose lock (before Python 3.12) is shared by all
+    # the instances and would serialize the fetches of concurrent threads
+    _readme: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
 
     @property
     def name(self) -> str:
@@ -56,34 +67,87 @@ class GithubRepo:
         return self.full_name.split("/")[1]
 
     @property
-    def readme(self) -> str:
-        """Return the repository README."""
-        return sh.gh.repo.view(self.full_name, _tty_out=False)
+    def readme(self) -> bytes:
+        """Return the repository README, undecoded since only the badges are extracted."""
+        if self._readme is None:
+            self._readme = sh.gh.repo.view(self.full_name, _tty_out=False, _return_cmd=True).stdout
+        return self._readme
 
     @property
     def workflows_in_readme(self) -> List[str]:
         """Extract the workflows that have badges on a repository's README."""
-        badges_regex = re.compile(
-            rf"\!\[.*\]\(https://github.com/{self.full_name}/actions/workflows/(.+)/badge.svg\)"
+        full_name = self.full_name.encode()
+        return [
+            match.group(2).decode()
+            for match in _BADGE_RE.finditer(self.readme)
+            if match.group(1) == full_name
+        ]
+
+    def workflow_files(self) -> Set[str]:
+        """Return the YAML file names of the workflows currently defined in the repository."""
+        workflows = json_loads(
+            sh.gh.api(
+                f"repos/{self.full_name}/actions/workflows?per_page=100",
+                _tty_out=False,
+                _return_cmd=True,
+            ).stdout
         )
-        return re.findall(badges_regex, self.readme)
+        return {os.path.basename(w["path"]) for w in workflows["workflows"]}
+
+    def recent_workflow_runs(self) -> Dict[str, Dict]:
+        """Return the latest of the recent runs of each workflow, in a single API call.
 
-    def workflow_status(self, workflow: str) -> WorkflowStatus:
+        Returns:
+            A dictionary mapping the workflows' YAML file names to their latest run, with the
+            same fields as `gh run list --json conclusion,status,url`.
+        """
+        runs = json_loads(
+            sh.gh.api(
+                f"repos/{self.full_name}/actions/runs?per_page=100",
+                _tty_out=False,
+                _return_cmd=True,
+            ).stdout
+        )
+        latest_runs = {}
+        for run in runs["workflow_runs"]:  # The runs are sorted from the most recent
+            workflow = os.path.basename(run["path"])
+            latest_runs.setdefault(
+                workflow,
+                {"conclusion": run["conclusion"], "status": run["status"], "url": run["html_url"]},
+            )
+        return latest_runs
+
+    def workflow_status(
+        self,
+        workflow: str,
+        recent_runs: Optional[Dict[str, Dict]] = None,
+        workflow_files: Optional[Set[str]] = None,
+    ) -> WorkflowStatus:
         """Return the status of the specified workflow.
 
         Args:
             workflow: The name of the YAML file of a workflow.
+            recent_runs: The output of `recent_workflow_runs`, if already fetched; workflows
+                without recent runs are still looked up with `gh run list`.
+            workflow_files: The output of `workflow_files`, if already fetched; workflows not
+                in it are reported as missing without looking up their runs.
         """
         try:
-            run_statuses = json.loads(
-                sh.gh.run.list(
-                    repo=self.full_name,
-                    workflow=workflow,
-                    json="conclusion,status,url",
-                    limit=1,
-                    _tty_out=False,
+            if recent_runs and workflow in recent_runs:
+                run_statuses = [recent_runs[workflow]]
+            elif workflow_files is not None and workflow not in workflow_files:  # Stale badge
+                return WorkflowStatus(name=workflow, status="missing")
+            else:
+                run_statuses = json_loads(
+                    sh.gh.run.list(
+                        repo=self.full_name,
+                        workflow=workflow,
+                        json="conclusion,status,url",
+                        limit=1,
+                        _tty_out=False,
+                        _return_cmd=True,
+                    ).stdout
                 )
-            )
             if not run_statuses:  # The workflow exists, but has no runs yet
                 return WorkflowStatus(name=workflow, status="no runs")
             run_status = run_statuses[0]  # We selected one run with limit=1
@@ -96,10 +160,43 @@ class GithubRepo:
             return WorkflowStatus(name=workflow, status="missing")
 
 
+def _workflows_and_runs(
+    repo: GithubRepo,
+) -> Tuple[List[str], Dict[str, Dict], Optional[Set[str]]]:
+    """Return the workflows with a badge in the README of a repo, and what's known about them.
+
+    Returns:
+        The workflows with a badge, their recent runs, and the workflow files of the repo. The
+        runs are empty if they can't be fetched (e.g., Actions are disabled or the API is rate
+        limited); the files are None if they aren't needed or can't be fetched, in which case
+        no workflow is reported as missing without looking up its runs.
+    """
+    workflows = repo.workflows_in_readme
+    # Repositories with no badges in the README are not reported, so skip their runs
+    if not workflows:
+        return workflows, {}, None
+    try:
+        recent_runs = repo.recent_workflow_runs()
+    except sh.ErrorReturnCode:
+        recent_runs = {}
+    if all(workflow in recent_runs for workflow in workflows):
+        return workflows, recent_runs, None  # No workflow needs to be looked up
+    try:
+        workflow_files: Optional[Set[str]] = repo.workflow_files()
+    except sh.ErrorReturnCode:
+        workflow_files = None
+    return workflows, recent_runs, workflow_files
+
+
 def team_ci_status(team_name: str):
     """Return the CI status of all unarchived repos under the specified Canonical team."""
-    team_repos = json.loads(
-        sh.gh.api(f"orgs/canonical/teams/{team_name}/repos", paginate=True, _tty_out=False)
+    team_repos = json_loads(
+        sh.gh.api(
+            f"orgs/canonical/teams/{team_name}/repos",
+            paginate=True,
+            _tty_out=False,
+            _return_cmd=True,
+        ).stdout
     )
     repos = [GithubRepo(full_name=r["full_name"]) for r in team_repos if not r["archived"]]
     repos.sort(key=lambda x: x.full_name)
@@ -114,18 +211,38 @@ def team_ci_status(team_name: str):
         transient=True,
     )
     progress_task = progress.add_task("Fetching CI", total=len(repos), repo="")
-    with progress:
-        for repo in repos:
+    with progress, ThreadPoolExecutor(max_workers=16) as executor:
+        # Find the workflows with badges in the README of each repository, and their recent runs
+        readme_futures = {executor.submit(_workflows_and_runs, r): r for r in repos}
+        workflows: Dict[str, List[str]] = {}
+        recent_runs: Dict[str, Dict[str, Dict]] = {}
+        workflow_files: Dict[str, Optional[Set[str]]] = {}
+        for future in as_completed(readme_futures):
+            repo = readme_futures[future]
+            workflows[repo.name], recent_runs[repo.name], workflow_files[repo.name] = (
+                future.result()
+            )
             progress.update(progress_task, advance=1, repo=repo.name)
-            ci_status[repo.name] = []
-            # Process repositories with no badges in the README
-            workflows = repo.workflows_in_readme
-            if not workflows:
-                continue
-
-            # For each workflow, report its status
-            for workflow_yaml in workflows:
-                workflow_status: WorkflowStatus = repo.workflow_status((workflow_yaml))
-                ci_status[repo.name].append(workflow_status)
 
+        # Fetch the status of all the workflows at once, then report them in the README order
+        status_futures = {
+            (repo.name, workflow_yaml): executor.submit(
+                repo.workflow_status,
+                workflow_yaml,
+                recent_runs[repo.name],
+                workflow_files[repo.name],
+            )
+            for repo in repos
+            for workflow_yaml in workflows[repo.name]
+        }
+        progress.update(progress_task, total=len(repos) + len(status_futures))
+        futures_keys = {future: key for key, future in status_futures.items()}
+        for future in as_completed(futures_keys):
+            progress.update(progress_task, advance=1, repo=futures_keys[future][0])
+
+    for repo in repos:
+        ci_status[repo.name] = [
+            status_futures[(repo.name, workflow_yaml)].result()
+            for workflow_yaml in workflows[repo.name]
+        ]
     return ci_status
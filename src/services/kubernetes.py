@@ -1,12 +1,43 @@
-"""Wraps and extend `charmcraft` commands."""
+"""Manage the pods used to test rocks in Kubernetes.
+
+The pods are managed through the Kubernetes API, while the interactive sessions and the
+Goss validation still go through `kubectl`.
+"""
+
+import functools
+import os
+from pathlib import Path
+from typing import List, Optional
 
 import sh
-from rich.console import Console
-from tenacity import TryAgain, retry, wait_fixed
+from kubernetes import client, config, watch
+from kubernetes.stream import stream
+from tenacity import retry, retry_if_exception_type, stop_after_attempt
+from urllib3.exceptions import ProtocolError
+
+from _ui import console
+
+try:  # orjson is an optional, faster drop-in for parsing the JSON responses
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 # pyright: reportAttributeAccessIssue=false
 
-console = Console()
+POD_WAIT_TIMEOUT = 300  # seconds
+_STDIN_CHUNK_SIZE = 64 * 1024  # bytes
+
+_INSTALL_GOSS_SCRIPT = """set -e
+if command -v goss > /dev/null; then
+    echo "already installed"
+    exit 0
+fi
+apt-get update
+apt-get install -y curl
+curl -L https://github.com/goss-org/goss/releases/latest/download/goss-linux-{arch} \\
+    -o /usr/bin/goss
+chmod +rx /usr/bin/goss
+"""
 
 
 class InputError(Exception):
@@ -17,49 +48,144 @@ class KubernetesError(Exception):
     """Triggered by a failure in a Kubernetes interaction."""
 
 
-def _is_pod_running(pod: str, namespace: str) -> bool:
-    """Check if a pod is in the Running status."""
-    pod_status = sh.kubectl.get.pod(
-        pod, namespace=namespace, output="jsonpath={.status.phase}", _long_sep=" "
+@functools.lru_cache()
+def _api() -> client.CoreV1Api:
+    """Return a client for the Kubernetes core API, loading the configuration on first use."""
+    if os.environ.get("KUBERNETES_SERVICE_HOST"):
+        config.load_incluster_config()
+    else:
+        config.load_kube_config()
+    return client.CoreV1Api()
+
+
+def _check_pod_phase(pod: str, phase: Optional[str]) -> bool:
+    """Return True if a pod is Running, raising an error if it will never be."""
+    if phase in ("Failed", "Succeeded"):
+        raise KubernetesError(f"Pod {pod} terminated with phase {phase}")
+    return phase == "Running"
+
+
+def _list_pod(pod: str, namespace: str, **kwargs):
+    """List a pod by name, reading it from the API server's watch cache instead of etcd.
+
+    With resource_version="0" the result may be slightly stale, which trades strict
+    read-after-write consistency for cheaper reads; callers either watch for the following
+    changes or only need a best-effort answer.
+    """
+    return _api().list_namespaced_pod(
+        namespace, field_selector=f"metadata.name={pod}", resource_version="0", **kwargs
     )
-    return pod_status == "Running"
 
 
-@retry(wait=wait_fixed(1))  # TODO: add  max retries
+# Only retry when the connection to the API server drops while watching
+@retry(retry=retry_if_exception_type(ProtocolError), stop=stop_after_attempt(3), reraise=True)
 def _wait_for_pod(pod: str, namespace: str):
     """Wait for a pod to be in Running status."""
-    if not _is_pod_running(pod=pod, namespace=namespace):
-        raise TryAgain
+    pods = _list_pod(pod, namespace)  # The watch catches up if the cache is stale
+    if pods.items and _check_pod_phase(pod, pods.items[0].status.phase):
+        return
+
+    pod_watch = watch.Watch()
+    for event in pod_watch.stream(
+        _api().list_namespaced_pod,
+        namespace,
+        field_selector=f"metadata.name={pod}",
+        resource_version=pods.metadata.resource_version,
+        timeout_seconds=POD_WAIT_TIMEOUT,
+    ):
+        if _check_pod_phase(pod, event["object"].status.phase):
+            pod_watch.stop()
+            return
+    raise KubernetesError(f"Pod {pod} not Running after {POD_WAIT_TIMEOUT} seconds")
+
+
+def _exec(pod: str, namespace: str, command: List[str], stdin: Optional[bytes] = None) -> str:
+    """Run a command in a pod and return its output.
+
+    Args:
+        pod: Name of the pod.
+        namespace: Namespace of the pod.
+        command: Command to run, as a list of arguments.
+        stdin: Data to write to the standard input of the command. Since the exec protocol
+            can't signal the end of the input, the command must stop reading on its own.
+
+    Raises:
+        KubernetesError: If the command exits with a non-zero code.
+    """
+    session = stream(
+        _api().connect_get_namespaced_pod_exec,
+        pod,
+        namespace,
+        command=command,
+        stdin=stdin is not None,
+        stdout=True,
+        stderr=True,
+        tty=False,
+        _preload_content=False,
+    )
+    if stdin is not None:
+        for offset in range(0, len(stdin), _STDIN_CHUNK_SIZE):
+            session.write_stdin(stdin[offset : offset + _STDIN_CHUNK_SIZE])
+    session.run_forever()
+    if session.returncode != 0:
+        raise KubernetesError(
+            f"Command {command} failed in pod {pod} (exit code {session.returncode}): "
+            f"{session.read_stderr()}"
+        )
+    return session.read_stdout()
 
 
 def _pod_exists(pod: str, namespace: str) -> bool:
     """Check if a pod exists."""
-    try:
-        sh.kubectl.get.pod(pod, namespace=namespace, _out=None)
-        return True
-    except sh.ErrorReturnCode_1:
-        return False
+    # Only the list of items is needed, so skip the deserialization into V1Pod objects
+    response = _list_pod(pod, namespace, limit=1, _preload_content=False)
+    return bool(json_loads(response.data)["items"])
 
 
 def run(pod: str, namespace: str, image_uri: str):
     """Run a pod from the specified image."""
-    console.print(f"Running {pod}... ", end="")
+    console().print(f"Running {pod}... ", end="")
     if _pod_exists(pod=pod, namespace=namespace):
-        console.print("already up.")
+        console().print("already up.")
         return
-    sh.kubectl.run(pod, image=image_uri, namespace=namespace)
-    console.print("done.")
+    # Same pod as the one created by `kubectl run`
+    manifest = client.V1Pod(
+        metadata=client.V1ObjectMeta(name=pod, labels={"run": pod}),
+        spec=client.V1PodSpec(containers=[client.V1Container(name=pod, image=image_uri)]),
+    )
+    _api().create_namespaced_pod(namespace, manifest)
+    console().print("done.")
+
+
+# Only retry when the connection to the API server drops while watching
+@retry(retry=retry_if_exception_type(ProtocolError), stop=stop_after_attempt(3), reraise=True)
+def _wait_for_pod_deletion(pod: str, namespace: str, resource_version: str):
+    """Wait for a pod to be gone, watching its events since the given resource version."""
+    pod_watch = watch.Watch()
+    for event in pod_watch.stream(
+        _api().list_namespaced_pod,
+        namespace,
+        field_selector=f"metadata.name={pod}",
+        resource_version=resource_version,
+        timeout_seconds=POD_WAIT_TIMEOUT,
+    ):
+        if event["type"] == "DELETED":
+            pod_watch.stop()
+            return
+    raise KubernetesError(f"Pod {pod} not deleted after {POD_WAIT_TIMEOUT} seconds")
 
 
 def stop(pod: str, namespace: str):
-    """Delete a pod."""
-    sh.kubectl.delete.pod(pod, namespace=namespace)
-    console.print(f"{pod} deleted")
+    """Delete a pod, waiting for it to be gone like `kubectl delete pod` does."""
+    deleted_pod = _api().delete_namespaced_pod(pod, namespace)
+    # The deletion is only accepted at this point: the pod is still terminating
+    _wait_for_pod_deletion(pod, namespace, deleted_pod.metadata.resource_version)
+    console().print(f"{pod} deleted")
 
 
 def open_shell(pod: str, namespace: str):
     """Open a shell into a Running pod."""
-    console.print(f"Opening a shell into {pod}")
+    console().print(f"Opening a shell into {pod}")
     _wait_for_pod(pod=pod, namespace=namespace)
     sh.kubectl.exec(pod, f"--namespace={namespace}", "-it", "--", "/bin/bash", _fg=True)
 
@@ -67,31 +193,23 @@ def open_shell(pod: str, namespace: str):
 def install_goss(pod: str, namespace: str, arch: str = "amd64"):
     """Install the latest Goss in a pod."""
     _wait_for_pod(pod=pod, namespace=namespace)
-    console.print(f"Installing Goss in {pod}... ", end="")
-    kubectl_exec = sh.kubectl.exec.bake(pod, namespace=namespace).bake("-it", "--", _tty_in=True)
-    try:
-        kubectl_exec.which("goss")
-        console.print("already installed.")
-    except sh.ErrorReturnCode_1:
-        kubectl_exec.apt.update()
-        kubectl_exec.apt.install("curl", y=True)
-        kubectl_exec.curl(
-            "-L",
-            f"https://github.com/goss-org/goss/releases/latest/download/goss-linux-{arch}",
-            "-o",
-            "/usr/bin/goss",
-        )
-        kubectl_exec.chmod("+rx", "/usr/bin/goss")
-        console.print("done.")
+    console().print(f"Installing Goss in {pod}... ", end="")
+    # Run all the steps in a single exec session, instead of one per command
+    output = _exec(pod, namespace, ["/bin/sh", "-c", _INSTALL_GOSS_SCRIPT.format(arch=arch)])
+    if output.strip() == "already installed":
+        console().print("already installed.")
+    else:
+        console().print("done.")
 
 
 def install_goss_checks(pod: str, namespace: str, path: str):
     """Copy the 'goss.yaml' file in the pod."""
     _wait_for_pod(pod=pod, namespace=namespace)
-    console.print(f"Copying goss.yaml to {pod}...", end="")
-    kubectl_cp = sh.kubectl.cp.bake(namespace=namespace)
-    kubectl_cp(path, f"{pod}:/goss.yaml")
-    console.print("done.")
+    console().print(f"Copying goss.yaml to {pod}...", end="")
+    # Stream the file over exec instead of going through the tar round-trip of `kubectl cp`
+    checks = Path(path).read_bytes()
+    _exec(pod, namespace, ["/bin/sh", "-c", f"head -c {len(checks)} > /goss.yaml"], stdin=checks)
+    console().print("done.")
 
 
 def run_goss(pod: str, namespace: str, is_ci: bool):
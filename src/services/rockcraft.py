@@ -1,18 +1,36 @@
 """Wraps and extend `rockcraft` commands."""
 
-import json
+import functools
+import hashlib
+import os
 import re
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Set, Tuple
+from urllib.parse import urljoin
 
 import requests
 import sh
 import yaml
-from packaging.version import Version
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:  # orjson is an optional, faster drop-in for parsing the JSON responses
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 # pyright: reportAttributeAccessIssue=false
 
+# Registries that the rocks are pushed to in-process, over plain HTTP
+_LOCAL_REGISTRY_HOSTS = ("localhost", "127.0.0.1")
+_OCI_INDEX_MEDIA_TYPE = "application/vnd.oci.image.index.v1+json"
+
+# Versions should be major.minor or major.minor.patch
+_VERSION_FOLDER_RE = re.compile(r"^\d+\.\d+(\.\d+)?$")
+
 
 class InputError(Exception):
     """Exception due to wrong user or file input."""
@@ -22,6 +40,19 @@ class GitHubError(Exception):
     """Trigger by failed interactions with GitHub."""
 
 
+class RegistryError(Exception):
+    """Trigger by failed interactions with a container registry."""
+
+
+def _version_key(version: str) -> Tuple[int, int, int]:
+    """Return a sort key for a MAJOR[.MINOR[.PATCH]] version, ignoring any '-suffix'.
+
+    Missing parts count as 0, so that (like with packaging's Version) '2.45' == '2.45.0'.
+    """
+    major, minor, patch = (*map(int, version.partition("-")[0].split(".")), 0, 0)[:3]
+    return major, minor, patch
+
+
 def local_tags(version_folders: List[str]) -> Dict[str, List[str]]:
     """Compute the tags that would be assigned to each rock version.
 
@@ -35,62 +66,110 @@ def local_tags(version_folders: List[str]) -> Dict[str, List[str]]:
     Returns:
         A dictionary with structure {version: list(tags)}.
     """
-    # Versions should be major.minor or major.minor.patch
-    version_regex = re.compile(r"^\d+\.\d+(\.\d+)?$")
-    versions = list(filter(lambda x: version_regex.match(x), version_folders))
+    versions = [v for v in version_folders if _VERSION_FOLDER_RE.match(v)]
 
     if not versions:
         raise InputError("There are no versioned folders in the current working directory.")
 
-    # Sort the versions semantically
-    versions.sort(key=Version)
-    tags = {}
+    # Parse each version only once, then sort them semantically; the regex guarantees that
+    # they are plain integer tuples, which compare much faster than packaging's Version
+    parsed = {v: _version_key(v) for v in versions}
+    versions.sort(key=parsed.__getitem__)
+    # The highest version each tag points to, along with its folder name
+    best: Dict[str, Tuple[Tuple[int, int, int], str]] = {}
     for version_str in versions:
-        version_search = re.search(version_regex, version_str)
-        has_patch = True if version_search and version_search.group(1) else False
-
-        version = Version(version_str)
-        major_tag = f"{version.major}"
-        minor_tag = f"{version.major}.{version.minor}"
-        patch_tag = f"{version.major}.{version.minor}.{version.micro}" if has_patch else None
-        # Add the tags if they don't exist
-        if major_tag not in tags:
-            tags[major_tag] = version_str
-        if minor_tag not in tags:
-            tags[minor_tag] = version_str
-        if patch_tag and patch_tag not in tags:
-            tags[patch_tag] = version_str
-        # Compare the versions if the tag already exists
-        if version > Version(tags[major_tag]):
-            tags[major_tag] = version_str
-        if version > Version(tags[minor_tag]):
-            tags[minor_tag] = version_str
-
-    tags_per_version = {}
-    for v in versions:
-        tag_list = [tag for tag, ver in tags.items() if ver == v]
-        tags_per_version[v] = tag_list
+        version = parsed[version_str]
+        major, minor, patch = version
+        tags = [f"{major}", f"{major}.{minor}"]
+        if version_str.count(".") == 2:
+            tags.append(f"{major}.{minor}.{patch}")
+        # Add the tags if they don't exist, or move them if this version is higher
+        for tag in tags:
+            current = best.get(tag)
+            if current is None or version > current[0]:
+                best[tag] = (version, version_str)
+
+    # Invert the mapping, keeping the versions without tags
+    tags_per_version: Dict[str, List[str]] = {v: [] for v in versions}
+    for tag, (_, version_str) in best.items():
+        tags_per_version[version_str].append(tag)
 
     return tags_per_version
 
 
+def _http_cache_paths(url: str) -> Tuple[Path, Path]:
+    """Return the paths where the ETag and the body of a URL's response are cached."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    entry = Path(cache_home, "noctua", "http", hashlib.sha256(url.encode()).hexdigest())
+    return entry.with_suffix(".etag"), entry.with_suffix(".body")
+
+
+@functools.cache
+def _github_session() -> requests.Session:
+    """Return the HTTP session used for GitHub requests, keeping its TLS connections alive."""
+    session = requests.Session()
+    # Once the retries are exhausted, return the last response for its status to be checked
+    retries = Retry(
+        total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504], raise_on_status=False
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=retries))
+    return session
+
+
+def _get_revalidated(url: str) -> Tuple[int, bytes]:
+    """GET a URL, sending the ETag of the cached response to avoid downloading it again.
+
+    Returns:
+        The status code and the raw body of the response; a '304 Not Modified' response is
+        returned as a 200 with the cached body.
+    """
+    etag_path, body_path = _http_cache_paths(url)
+    try:
+        cached_etag = etag_path.read_text()
+    except OSError:
+        cached_etag = None
+    session = _github_session()
+    r = session.get(url, headers={"If-None-Match": cached_etag} if cached_etag else {}, timeout=10)
+    if r.status_code == 304 and cached_etag:
+        try:
+            return 200, body_path.read_bytes()
+        except OSError:  # The cached body is gone, download it again
+            r = session.get(url, headers={}, timeout=10)
+    etag = r.headers.get("ETag")
+    if r.status_code == 200 and etag:
+        try:
+            body_path.parent.mkdir(parents=True, exist_ok=True)
+            body_path.write_bytes(r.content)
+            etag_path.write_text(etag)
+        except OSError:  # The cache is only an optimization
+            pass
+    return r.status_code, r.content
+
+
 def oci_factory_tags(rock_name: str) -> List[str]:
     """Return the tags currently built in OCI Factory (from _releases.json).
 
+    The tags are fetched once per process for each rock.
+
     Args:
         rock_name: The rock name as it appears in OCI Factory (e.g., 'prometheus').
     """
+    return list(_oci_factory_tags(rock_name))
+
+
+@functools.lru_cache(maxsize=32)
+def _oci_factory_tags(rock_name: str) -> Tuple[str, ...]:
+    """Fetch the tags of a rock from OCI Factory, as an immutable (cacheable) tuple."""
     if "-rock" in rock_name:
         raise InputError(f"{rock_name} should be the rock name, not the repository.")
     releases_url = f"https://raw.githubusercontent.com/canonical/oci-factory/main/oci/{rock_name}/_releases.json"
-    r = requests.get(releases_url)
-    if r.status_code == 404:
-        return []
+    status_code, body = _get_revalidated(releases_url)
+    if status_code == 404:
+        return ()
 
-    if r.status_code != 200:
+    if status_code != 200:
         raise GitHubError(
-            f"Error getting info from OCI Factory for {rock_name}: "
-            f"request returned {r.status_code}"
+            f"Error getting info from OCI Factory for {rock_name}: request returned {status_code}"
         )
 
     # raw_tags has the following format:
@@ -104,11 +183,40 @@ def oci_factory_tags(rock_name: str) -> List[str]:
     #     },
     #     ...
     # }
-    raw_tags = json.loads(r.text)
+    raw_tags = json_loads(body)
     # Remove the -base suffix
-    tags = [t.split("-")[0] for t in raw_tags.keys()]
-    tags.sort(key=Version)
-    return tags
+    tags = [t.partition("-")[0] for t in raw_tags]
+    tags.sort(key=_version_key)
+    return tuple(tags)
+
+
+def oci_factory_tags_batch(rock_names: List[str]) -> Dict[str, List[str]]:
+    """Return the tags currently built in OCI Factory for several rocks, fetched concurrently.
+
+    Args:
+        rock_names: The rock names as they appear in OCI Factory (e.g., ['prometheus']).
+
+    Returns:
+        A dictionary with structure {rock_name: list(tags)}.
+    """
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        return dict(zip(rock_names, executor.map(oci_factory_tags, rock_names)))
+
+
+# Plain scalars that don't need any look at the YAML resolver (e.g., names, SHAs, versions)
+_YAML_PLAIN_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_./-]*$")
+_YAML_RESOLVER = yaml.resolver.Resolver()
+
+
+@functools.lru_cache(maxsize=256)
+def _yaml_scalar(value: str) -> str:
+    """Format a string as a YAML scalar, quoting it the same way `yaml.safe_dump` does."""
+    if _YAML_PLAIN_RE.match(value) and (
+        _YAML_RESOLVER.resolve(yaml.ScalarNode, value, (True, False)) == "tag:yaml.org,2002:str"
+    ):
+        return value
+    # Strings that would be read back as other types (e.g., '1.0' or timestamps) get quoted
+    return yaml.safe_dump(value).removesuffix("\n...\n").rstrip("\n")
 
 
 def oci_factory_manifest(
@@ -128,38 +236,34 @@ def oci_factory_manifest(
     Returns:
         The generated 'image.yaml', formatted according to OCI Factory standards.
     """
-
-    class CompliantDumper(yaml.Dumper):
-        def increase_indent(self, flow=True, indentless=False):
-            """Force indent when executing dump."""
-            return super().increase_indent(flow, False)
-
-    end_of_life_date = datetime.now() + timedelta(days=365 / 4)  # EOL is 3 months by default
-    end_of_life_patch_date = datetime.now() - timedelta(days=1)  # for patch releases
+    now = datetime.now()  # read once, so that both dates are relative to the same day
+    end_of_life_date = now + timedelta(days=365 / 4)  # EOL is 3 months by default
+    end_of_life_patch_date = now - timedelta(days=1)  # for patch releases
     end_of_life = f"{end_of_life_date.strftime('%Y-%m-%d')}T00:00:00Z"
     end_of_life_patch = f"{end_of_life_patch_date.strftime('%Y-%m-%d')}T00:00:00Z"
+    eol, eol_patch = _yaml_scalar(end_of_life), _yaml_scalar(end_of_life_patch)
 
-    manifest = {}
-    manifest["version"] = 1
-    manifest["upload"] = []
+    # The manifest has a fixed schema, so it's emitted directly rather than with a YAML dumper
+    lines = ["version: 1", "upload:" if versions_with_tags else "upload: []"]
     for version, tags in versions_with_tags.items():
-        upload_item = {}
-        upload_item["source"] = repository
-        upload_item["commit"] = commit
-        upload_item["directory"] = version
-        upload_item["release"] = {}
+        lines.append(f"  - source: {_yaml_scalar(repository)}")
+        lines.append(f"    commit: {_yaml_scalar(commit)}")
+        lines.append(f"    directory: {_yaml_scalar(version)}")
+        lines.append("    release:" if tags else "    release: {}")
         for tag in tags:
             # for patch tags, we set end-of-life to be "yesterday"
-            is_tag_with_patch = len(tag.split("-")[0].split(".")) == 3
-            upload_item["release"][tag] = {
-                "end-of-life": end_of_life_patch if is_tag_with_patch else end_of_life,
-                "risks": ["stable"],
-            }
-        manifest["upload"].append(upload_item)
+            is_tag_with_patch = tag.partition("-")[0].count(".") == 2
+            lines.append(f"      {_yaml_scalar(tag)}:")
+            lines.append(f"        end-of-life: {eol_patch if is_tag_with_patch else eol}")
+            lines.append("        risks:")
+            lines.append("          - stable")
+    return "\n".join(lines)
+
 
-    return yaml.dump(
-        manifest, Dumper=CompliantDumper, default_flow_style=False, sort_keys=False, indent=2
-    ).strip()
+@functools.cache
+def _skopeo() -> sh.Command:
+    """Return the `skopeo` command shipped with Rockcraft, resolving it only once."""
+    return sh.Command("rockcraft.skopeo").bake(insecure_policy=True)
 
 
 def push_to_registry(
@@ -178,7 +282,75 @@ def push_to_registry(
     Returns:
         A URI of the rock in the registry (e.g., `docker://localhost:32000/image:tag`).
     """
-    skopeo: sh.Command = sh.Command("rockcraft.skopeo").bake(insecure_policy=True)
     image_uri = f"{registry}/{image_name}:{image_tag}"
-    skopeo.copy(f"oci-archive:{path}", f"docker://{image_uri}", dest_tls_verify="false")
+    if registry.partition(":")[0] in _LOCAL_REGISTRY_HOSTS:
+        _push_oci_archive(path, f"http://{registry}/v2/{image_name}", image_tag)
+    else:
+        _skopeo().copy(f"oci-archive:{path}", f"docker://{image_uri}", dest_tls_verify="false")
     return image_uri
+
+
+@functools.cache
+def _registry_session() -> requests.Session:
+    """Return the HTTP session used for in-process pushes, reusing its connections."""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    return session
+
+
+def _push_oci_archive(path: str | Path, repository_url: str, tag: str):
+    """Push an OCI archive to a registry with the distribution API, without repacking it.
+
+    Blobs already in the registry (e.g., layers unchanged since the previous push) are skipped.
+
+    Args:
+        path: Path to the OCI archive (e.g., a .rock file).
+        repository_url: URL of the repository in the registry API
+            (e.g., `http://localhost:32000/v2/image`).
+        tag: Tag to apply to the pushed image.
+    """
+    session = _registry_session()
+    pushed: Set[str] = set()
+
+    def push_blob(archive: tarfile.TarFile, digest: str):
+        if digest in pushed:
+            return
+        r = session.head(f"{repository_url}/blobs/{digest}")
+        if r.status_code != 200:
+            r = session.post(f"{repository_url}/blobs/uploads/")
+            if r.status_code != 202:
+                raise RegistryError(f"Couldn't start the upload of {digest}: {r.status_code}")
+            blob = archive.extractfile(f"blobs/{digest.replace(':', '/', 1)}")
+            r = session.put(
+                urljoin(r.url, r.headers["Location"]),
+                params={"digest": digest},
+                data=blob,
+                headers={"Content-Type": "application/octet-stream"},
+            )
+            if r.status_code != 201:
+                raise RegistryError(f"Couldn't upload {digest}: {r.status_code}")
+        pushed.add(digest)
+
+    def push_manifest(archive: tarfile.TarFile, descriptor: Dict, reference: str):
+        manifest_file = archive.extractfile(f"blobs/{descriptor['digest'].replace(':', '/', 1)}")
+        manifest_bytes = manifest_file.read()  # pyright: ignore[reportOptionalMemberAccess]
+        manifest = json_loads(manifest_bytes)
+        if descriptor["mediaType"] == _OCI_INDEX_MEDIA_TYPE:
+            for child in manifest["manifests"]:
+                push_manifest(archive, child, child["digest"])
+        else:
+            for blob in (manifest["config"], *manifest["layers"]):
+                push_blob(archive, blob["digest"])
+        r = session.put(
+            f"{repository_url}/manifests/{reference}",
+            data=manifest_bytes,
+            headers={"Content-Type": descriptor["mediaType"]},
+        )
+        if r.status_code != 201:
+            raise RegistryError(f"Couldn't push the manifest {reference}: {r.status_code}")
+
+    with tarfile.open(path) as archive:
+        index_file = archive.extractfile("index.json")
+        index = json_loads(index_file.read())  # pyright: ignore[reportOptionalMemberAccess]
+        for descriptor in index["manifests"]:
+            push_manifest(archive, descriptor, tag)
@@ -0,0 +1,111 @@
+"""Shared fixtures for the tests.
+
+The expected objects are built in session-scoped fixtures, so they are only constructed once
+and only when a test requests them; the raw test data is read through `tests.constants`,
+and objects needed by a single test are built in that test. The console output is silenced
+for the whole session, and patches shared by several tests are provided as fixtures.
+"""
+
+import builtins
+import io
+import json
+import os
+from types import MappingProxyType
+from typing import Iterator, Mapping, Tuple
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
+import yaml
+
+import tests.constants as constants
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _silence_rich() -> Iterator[None]:
+    """Silence the console output of the services, once for the whole session."""
+    with patch("rich.console.Console.print", Mock()):
+        yield
+
+
+@pytest.fixture
+def blackbox_metadata() -> Iterator[MagicMock]:
+    """Make `services.charmcraft.metadata` return the metadata of 'blackbox-exporter-k8s'.
+
+    Unlike the console, this patch is undone after each test, so that it doesn't leak into
+    the tests of `metadata()` itself.
+    """
+    metadata = constants.charm_metadata("blackbox-exporter-k8s")
+    with patch("services.charmcraft.metadata", MagicMock(return_value=metadata)) as mock:
+        yield mock
+
+
+@pytest.fixture(scope="session")
+def fake_files_contents() -> Mapping[str, bytes]:
+    """Return the contents of the files served by `fake_files`, built once per session.
+
+    The metadata of 'blackbox-exporter-k8s' is served as both 'metadata.yaml' and
+    'charmcraft.yaml', and each library in 'tests/fixtures/lib' at its path; both are relative
+    to the working directory.
+    """
+    dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+    metadata = yaml.dump(constants.charm_metadata("blackbox-exporter-k8s"), Dumper=dumper)
+    files = {"metadata.yaml": metadata.encode(), "charmcraft.yaml": metadata.encode()}
+    for library in constants.FIXTURES.glob("lib/**/*.py.txt"):
+        path = str(library.relative_to(constants.FIXTURES).with_suffix(""))
+        files[path] = constants.charm_library(path)
+    return MappingProxyType(files)
+
+
+@pytest.fixture
+def fake_files(fake_files_contents) -> Iterator[Mapping[str, bytes]]:
+    """Serve the charm files read by the services from memory, during a single test.
+
+    `open()` is patched to return the contents from `fake_files_contents`; any other file is
+    opened as usual.
+    """
+    real_open = builtins.open
+
+    def fake_open(file, mode="r", *args, **kwargs):
+        is_path = isinstance(file, (str, os.PathLike))
+        contents = fake_files_contents.get(os.path.relpath(file)) if is_path else None
+        if contents is None:
+            return real_open(file, mode, *args, **kwargs)
+        return io.BytesIO(contents) if "b" in mode else io.StringIO(contents.decode())
+
+    with patch("builtins.open", fake_open):
+        yield fake_files_contents
+
+
+@pytest.fixture(scope="session")
+def charmcraft_list_lib_json() -> Mapping[str, bytes]:
+    """Return the output of `charmcraft list-lib --format=json` for each charm in the constants."""
+    return MappingProxyType(
+        {
+            charm: json.dumps([library._asdict() for library in libraries]).encode()
+            for charm, libraries in constants.CHARMCRAFT_LIST_LIB.items()
+        }
+    )
+
+
+@pytest.fixture(scope="session")
+def charmcraft_list_lib_expected() -> Mapping[str, Tuple]:
+    """Return the CharmLibrary objects expected from the `charmcraft list-lib` of each charm.
+
+    The libraries of each charm are sorted by name and version, once per session.
+    """
+    import services.charmcraft as charmcraft
+
+    def sort_key(library: charmcraft.CharmLibrary):
+        return library.library_name, library.api, library.patch
+
+    return MappingProxyType(
+        {
+            charm: tuple(
+                sorted(
+                    (charmcraft.CharmLibrary(**library._asdict()) for library in libraries),
+                    key=sort_key,
+                )
+            )
+            for charm, libraries in constants.CHARMCRAFT_LIST_LIB.items()
+        }
+    )
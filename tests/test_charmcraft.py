@@ -1,93 +1,149 @@
+import functools
 import json
-from typing import List
-from unittest.mock import MagicMock, call, mock_open, patch
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Dict, List, Tuple
+from unittest.mock import MagicMock, Mock, call, patch
 
 import pytest
-import yaml
+import sh
 
 import services.charmcraft as charmcraft
 import tests.constants as constants
 
 
 @pytest.mark.parametrize("metadata_file", ["metadata.yaml", "charmcraft.yaml", None])
+@pytest.mark.usefixtures("fake_files")
 def test_metadata(metadata_file):
+    charmcraft._load_metadata.cache_clear()
     if metadata_file:
         # Patch os.path.exists to return True only for metadata_file
         with patch(
             "os.path.exists",
             MagicMock(side_effect=lambda x: True if x == metadata_file else False),
         ):
-            with patch(
-                "builtins.open",
-                new_callable=mock_open,
-                read_data=yaml.dump(constants.CHARM_METADATA_BLACKBOX),
-            ):
-                assert charmcraft.metadata() == constants.CHARM_METADATA_BLACKBOX
+            with patch("os.path.getmtime", MagicMock(return_value=0.0)):
+                assert charmcraft.metadata() == constants.charm_metadata("blackbox-exporter-k8s")
     else:
         with patch("os.path.exists", MagicMock(return_value=False)):
             with pytest.raises(charmcraft.InputError):
                 charmcraft.metadata()
 
 
-@pytest.mark.parametrize(
-    "charm",
-    ["blackbox-exporter-k8s"],
+# The 'charmcraft status' fixture of 'blackbox-exporter-k8s', decoded only once
+BLACKBOX_STATUS = json.loads(constants.charmcraft_status("blackbox-exporter-k8s"))
+
+# (base, channel, status, revision, resource revisions) in the 'charmcraft status' fixture
+BLACKBOX_CHANNELS = (
+    ("20.04/amd64", "latest/stable", "closed", -1, ()),
+    ("20.04/amd64", "latest/candidate", "open", 1, (1,)),
+    ("20.04/amd64", "latest/beta", "open", 1, (1,)),
+    ("20.04/amd64", "latest/edge", "open", 1, (1,)),
+    ("22.04/amd64", "latest/stable", "open", 15, (3,)),
+    ("22.04/amd64", "latest/candidate", "open", 17, (4,)),
+    ("22.04/amd64", "latest/beta", "open", 17, (4,)),
+    ("22.04/amd64", "latest/edge", "open", 17, (4,)),
 )
-def test_release_status(charm: str):
-    with patch("sh.charmcraft", MagicMock()) as charmcraft_mock:
-        charmcraft_mock.status.return_value = constants.CHARMCRAFT_STATUS[charm]
-        release_status = charmcraft.release_status("fake-charm")
-        assert release_status == constants.RELEASE_STATUS[charm]
+
+
+@functools.lru_cache(maxsize=None)
+def _blackbox_release_status() -> Dict[str, charmcraft.TrackStatus]:
+    """Return the release status parsed from the 'charmcraft status' fixture, only once."""
+    with patch("sh.charmcraft", Mock(spec=["status"]), create=True) as charmcraft_mock:
+        charmcraft_mock.status.return_value.stdout = constants.charmcraft_status(
+            "blackbox-exporter-k8s"
+        )
+        return charmcraft.release_status("fake-charm")
+
+
+def test_release_status():
+    release_status = _blackbox_release_status()
+    assert list(release_status) == ["latest"]
+    bases = release_status["latest"].bases
+    assert list(bases) == ["20.04/amd64", "22.04/amd64"]
+    for base in bases.values():
+        assert [c.name for c in base.channels.values()] == [
+            "latest/stable",
+            "latest/candidate",
+            "latest/beta",
+            "latest/edge",
+        ]
+
+
+@pytest.mark.parametrize("base, channel, status, revision, resources", BLACKBOX_CHANNELS)
+def test_release_status_channels(base, channel, status, revision, resources):
+    channels = _blackbox_release_status()["latest"].bases[base].channels
+    assert channels[channel] == _channel(channel, base, status, revision, resources)
 
 
 @pytest.mark.parametrize(
     "charm_name, path",
     [
-        ("some-charm", "./some.charm"),
         ("some-charm", "./some.charm"),
         ("some-charm", ""),
-        ("some-charm", ""),
     ],
 )
-@patch("rich.console.Console.print", MagicMock())
+@pytest.mark.usefixtures("blackbox_metadata")
 def test_upload(charm_name, path):
-    with patch("os.path.exists", MagicMock(side_effect=lambda _: True if path else False)):
-        with patch(
-            "services.charmcraft.metadata",
-            MagicMock(return_value=constants.CHARM_METADATA_BLACKBOX),
-        ):
-            with patch(
-                "sh.charmcraft", MagicMock(return_value='{"revision": -1}'), create=True
-            ) as charmcraft_mock:
-                charmcraft_mock.upload.return_value = '{"revision": -2}'
-                # If the charm file doesn't exist, raise an exception
-                if not path:
-                    with pytest.raises(charmcraft.InputError):
-                        charmcraft.upload(charm_name=charm_name, path=path, dry_run=False)
-                    # Verify charmcraft was not called
-                    charmcraft_mock.assert_not_called()
-                    charmcraft_mock.upload.assert_not_called()
-                    return
-
-                # If there is a charm file
+    with ExitStack() as stack:
+        stack.enter_context(
+            patch("os.path.exists", MagicMock(side_effect=lambda _: True if path else False))
+        )
+        charmcraft_mock = stack.enter_context(
+            patch(
+                "sh.charmcraft",
+                Mock(spec=["upload"], return_value=Mock(stdout='{"revision": -1}')),
+                create=True,
+            )
+        )
+        charmcraft_mock.upload.return_value.stdout = '{"revision": -2}'
+        # If the charm file doesn't exist, raise an exception
+        if not path:
+            with pytest.raises(charmcraft.InputError):
                 charmcraft.upload(charm_name=charm_name, path=path, dry_run=False)
-                # Make sure charmcraft upload-resource and upload are called correctly
-                charmcraft_mock.assert_called_once_with(
-                    "upload-resource",
-                    "some-charm",
-                    "blackbox-exporter-image",
-                    image="docker://quay.io/prometheus/blackbox-exporter:v0.24.0",
-                    format="json",
-                    _tty_out=False,
-                )
-                charmcraft_mock.upload.assert_called_once_with(path, format="json", _tty_out=False)
+            # Verify charmcraft was not called
+            charmcraft_mock.assert_not_called()
+            charmcraft_mock.upload.assert_not_called()
+            return
+
+        # If there is a charm file
+        charmcraft.upload(charm_name=charm_name, path=path, dry_run=False)
+        # Make sure charmcraft upload-resource and upload are called correctly
+        charmcraft_mock.assert_called_once_with(
+            "upload-resource",
+            "some-charm",
+            "blackbox-exporter-image",
+            image="docker://quay.io/prometheus/blackbox-exporter:v0.24.0",
+            format="json",
+            _tty_out=False,
+            _return_cmd=True,
+        )
+        charmcraft_mock.upload.assert_called_once_with(
+            path, format="json", _tty_out=False, _return_cmd=True
+        )
 
 
-@pytest.mark.parametrize("resources", [(["resA:1", "resB:2"]), (["resA:1", "resB:2"])])
-@patch("rich.console.Console.print", MagicMock())
+@patch("os.path.exists", MagicMock(return_value=True))
+@patch("services.charmcraft.metadata", MagicMock(return_value={"resources": {}}))
+def test_upload_already_uploaded():
+    errors = {
+        "errors": [
+            {
+                "code": "review-error",
+                "message": "Upload failed.\nRevision of the existing package is: 42\nDone.",
+            }
+        ]
+    }
+    error = sh.ErrorReturnCode_1("charmcraft upload", json.dumps(errors).encode(), b"")
+    with patch("sh.charmcraft", Mock(spec=["upload"]), create=True) as charmcraft_mock:
+        charmcraft_mock.upload.side_effect = error
+        uploaded = charmcraft.upload(charm_name="some-charm", path="./some.charm")
+        assert uploaded.revision == 42
+
+
+@pytest.mark.parametrize("resources", [["resA:1", "resB:2"], []])
 def test_release(resources: List[str]):
-    with patch("sh.charmcraft", create=True) as charmcraft_mock:
-        charmcraft_mock.release = MagicMock()
+    with patch("sh.charmcraft", Mock(spec=["release"]), create=True) as charmcraft_mock:
         charm = "some-charm"
         channel = "track/channel"
         revision = -1
@@ -104,17 +160,53 @@ def test_release(resources: List[str]):
         )
 
 
-@patch("rich.console.Console.print", MagicMock())
+@functools.lru_cache(maxsize=None)
+def _resource(name: str, revision: int) -> charmcraft.CharmResource:
+    """Return a (frozen, hence shareable) resource, building each one only once."""
+    return charmcraft.CharmResource(name=name, revision=revision)
+
+
+def _channel(
+    name: str,
+    base: str = "22.04/amd64",
+    status: str = "open",
+    revision: int = 1,
+    resources: Tuple[int, ...] = (),
+) -> charmcraft.ChannelStatus:
+    """Build the status of a channel, with the given revisions of 'blackbox-exporter-image'."""
+    version, arch = base.split("/")
+    return charmcraft.ChannelStatus(
+        name=name,
+        status=status,  # pyright: ignore[reportArgumentType]
+        base_version=version,
+        base_arch=arch,
+        revision=revision,
+        resources=tuple(_resource("blackbox-exporter-image", r) for r in resources),
+    )
+
+
+def _release_status(*channels: charmcraft.ChannelStatus) -> Dict[str, charmcraft.TrackStatus]:
+    """Build the release status of a track from the status of its channels."""
+    bases: Dict[Tuple[str, str], Dict[str, charmcraft.ChannelStatus]] = {}
+    for channel in channels:
+        bases.setdefault((channel.base_version, channel.base_arch), {})[channel.name] = channel
+    track = channels[0].name.split("/")[0]
+    base_statuses = (
+        charmcraft.BaseStatus(version=version, arch=arch, channels=base_channels)
+        for (version, arch), base_channels in bases.items()
+    )
+    return {track: charmcraft.TrackStatus(name=track, bases={b.name: b for b in base_statuses})}
+
+
 def test_promote():
     charm = "blackbox-exporter-k8s"
     source = "latest/edge"
     target = "latest/beta"
-    with patch(
-        "services.charmcraft.release_status",
-        MagicMock(return_value=constants.RELEASE_STATUS[charm]),
-    ):
-        with patch("sh.charmcraft", create=True) as charmcraft_mock:
-            charmcraft_mock.release = MagicMock()
+    releases = _release_status(
+        *(_channel(name, base, *rest) for base, name, *rest in BLACKBOX_CHANNELS)
+    )
+    with patch("services.charmcraft.release_status", MagicMock(return_value=releases)):
+        with patch("sh.charmcraft", Mock(spec=["release"]), create=True) as charmcraft_mock:
             charmcraft.promote(charm=charm, source=source, target=target)
             charmcraft_mock.release.assert_has_calls(
                 [
@@ -124,7 +216,8 @@ def test_promote():
                     call(
                         charm, "--resource=blackbox-exporter-image:4", channel=target, revision=17
                     ),
-                ]
+                ],
+                any_order=True,
             )
             # Check promotion on a closed channels is skipped
             charmcraft.promote(charm=charm, source="latest/candidate", target="latest/stable")
@@ -132,22 +225,40 @@ def test_promote():
             assert charmcraft_mock.release.call_count == 3
 
 
-@patch("rich.console.Console.print", MagicMock())
+def test_promote_with_release_status():
+    charm = "blackbox-exporter-k8s"
+    releases = _release_status(
+        _channel("latest/candidate", "20.04/amd64"),
+        _channel("latest/beta", "20.04/amd64", resources=(1,)),
+        _channel("latest/candidate", revision=17),
+        _channel("latest/beta", revision=17, resources=(4,)),
+    )
+    with patch("services.charmcraft.release_status", MagicMock()) as release_status_mock:
+        with patch("sh.charmcraft", Mock(spec=["release"]), create=True) as charmcraft_mock:
+            charmcraft.promote(
+                charm=charm,
+                source="latest/beta",
+                target="latest/candidate",
+                releases=releases,
+            )
+            # The provided release status is used instead of querying Charmhub
+            release_status_mock.assert_not_called()
+            assert charmcraft_mock.release.call_count == 2
+
+
 @patch("os.path.exists", MagicMock(return_value=True))
-@patch("services.charmcraft.metadata", MagicMock(return_value=constants.CHARM_METADATA_BLACKBOX))
+@pytest.mark.usefixtures("blackbox_metadata")
 @patch(
     "services.charmcraft.status",
-    MagicMock(return_value=json.loads(constants.CHARMCRAFT_STATUS["blackbox-exporter-k8s"])),
+    MagicMock(return_value=BLACKBOX_STATUS),
 )
 def test_dry_runs():
-    with patch("sh.charmcraft", MagicMock(), create=True) as charmcraft_mock:
+    with patch("sh.charmcraft", Mock(spec=["upload", "release"]), create=True) as charmcraft_mock:
         # upload()
-        charmcraft_mock.upload = MagicMock()
         charmcraft.upload(charm_name="some-charm", path="./some.charm", dry_run=True)
         charmcraft_mock.assert_not_called()
         charmcraft_mock.upload.assert_not_called()
         # release()
-        charmcraft_mock.release = MagicMock()
         charmcraft.release(
             charm="some-charm", channel="some/channel", revision=-1, resources=[], dry_run=True
         )
@@ -160,22 +271,28 @@ def test_dry_runs():
 
 
 @patch("os.path.exists", MagicMock(return_value=True))
-@patch(
-    "services.charmcraft.CharmLibrary.from_file",
-    MagicMock(return_value=constants.CHARMCRAFT_LIST_LIB_EXPECTED["catalogue-k8s"]),
-)
 def test_local_charm_libraries():
-    with patch("os.walk") as walk_mock:
-        walk_mock.return_value = [
-            ("lib/charms", ("catalogue_k8s", "prometheus_k8s"), ()),
-            ("lib/charms/catalogue_k8s", ("v0",), ()),
-            ("lib/charms/catalogue_k8s/v0", (), ("catalogue.py", "cache.pyc")),
-        ]
-        with patch("services.charmcraft.CharmLibrary.from_file", MagicMock()) as from_file_mock:
-            from_file_mock.return_value.full_name = "charms.catalogue_k8s.v0.catalogue"
-            libraries = charmcraft.local_charm_libraries()
-            expected = {"charms.catalogue_k8s.v0.catalogue"}
-            assert set(libraries.keys()) == expected
+    with ExitStack() as stack:
+        glob_mock = stack.enter_context(patch("pathlib.Path.glob"))
+        glob_mock.return_value = [Path("lib/charms/catalogue_k8s/v0/catalogue.py")]
+        from_file_mock = stack.enter_context(
+            patch("services.charmcraft.CharmLibrary.from_file", MagicMock())
+        )
+        from_file_mock.return_value.full_name = "charms.catalogue_k8s.v0.catalogue"
+        libraries = charmcraft.local_charm_libraries()
+        expected = {"charms.catalogue_k8s.v0.catalogue"}
+        assert set(libraries.keys()) == expected
+        from_file_mock.assert_called_once_with("lib/charms/catalogue_k8s/v0/catalogue.py")
+
+
+def test_local_charm_libraries_skips_other_folders(tmp_path, monkeypatch):
+    for folder in ("v1", "v1_old", "v2.bak"):
+        library_path = tmp_path / "lib/charms/catalogue_k8s" / folder / "catalogue.py"
+        library_path.parent.mkdir(parents=True)
+        library_path.write_text("LIBAPI = 1\nLIBPATCH = 0\n")
+    monkeypatch.chdir(tmp_path)
+    libraries = charmcraft.local_charm_libraries()
+    assert list(libraries) == ["charms.catalogue_k8s.v1.catalogue"]
 
 
 @patch("os.path.exists", MagicMock(return_value=False))
@@ -187,8 +304,8 @@ def test_local_charm_libraries_failures():
 @patch("rich.progress.Progress", MagicMock())
 def test_outdated_charm_libraries():
     with patch(
-        "services.charmcraft.CharmLibrary.from_charmhub_with_name", MagicMock()
-    ) as charmhub_library_mock:
+        "services.charmcraft.CharmLibrary.from_charmhub", MagicMock()
+    ) as charmhub_libraries_mock:
         full_name_v0 = "charms.catalogue_k8s.v0.catalogue"
         full_name_v1000 = "charms.catalogue_k8s.v1000.catalogue"
         with patch(
@@ -201,9 +318,10 @@ def test_outdated_charm_libraries():
                 }
             ),
         ):
-            charmhub_library_mock.return_value = charmcraft.CharmLibrary(
+            charmhub_library = charmcraft.CharmLibrary(
                 charm_name="catalogue-k8s", library_name="catalogue", api=1000, patch=1000
             )
+            charmhub_libraries_mock.return_value = {charmhub_library.full_name: charmhub_library}
             assert full_name_v1000 in charmcraft.outdated_charm_libraries(minor=True, major=True)
             assert full_name_v1000 in charmcraft.outdated_charm_libraries(minor=False, major=True)
             assert full_name_v1000 not in charmcraft.outdated_charm_libraries(
@@ -213,9 +331,10 @@ def test_outdated_charm_libraries():
                 minor=False, major=False
             )
 
-            charmhub_library_mock.return_value = charmcraft.CharmLibrary(
+            charmhub_library = charmcraft.CharmLibrary(
                 charm_name="catalogue-k8s", library_name="catalogue", api=0, patch=1000
             )
+            charmhub_libraries_mock.return_value = {charmhub_library.full_name: charmhub_library}
             assert full_name_v0 in charmcraft.outdated_charm_libraries(minor=True, major=True)
             assert full_name_v0 not in charmcraft.outdated_charm_libraries(minor=False, major=True)
             assert full_name_v0 in charmcraft.outdated_charm_libraries(minor=True, major=False)
@@ -223,83 +342,88 @@ def test_outdated_charm_libraries():
                 minor=False, major=False
             )
 
+            # Charmhub is not queried when no update can be reported
+            charmhub_libraries_mock.reset_mock()
+            assert charmcraft.outdated_charm_libraries(minor=False, major=False) == {}
+            charmhub_libraries_mock.assert_not_called()
+
 
-@patch("rich.console.Console.print", MagicMock())
-@patch("services.charmcraft.metadata", MagicMock(return_value=constants.CHARM_METADATA_BLACKBOX))
+@pytest.mark.usefixtures("blackbox_metadata")
 def test_publish_charm_libraries():
-    with patch(
-        "services.charmcraft.local_charm_libraries",
-        MagicMock(),
-    ) as locals_mock:
-        with patch("sh.charmcraft", MagicMock(), create=True) as charmcraft_mock:
-            charmcraft_mock.return_value = '{"error_message": null}'
-            locals_mock.return_value = {
-                "charms.catalogue_k8s.v0.catalogue": charmcraft.CharmLibrary(
-                    charm_name="catalogue-k8s", library_name="catalogue", api=0, patch=10
-                )
-            }
-            charmcraft.publish_charm_libraries(dry_run=False)
-            # Charm is blackbox, libraries are catalogue: check no calls are made
-            charmcraft_mock.assert_not_called()
-            # Charm is blackbox
-            locals_mock.return_value = {
-                "charms.blackbox_exporter_k8s.v0.blackbox_probes": charmcraft.CharmLibrary(
-                    charm_name="blackbox-exporter-k8s",
-                    library_name="blackbox_probes",
-                    api=0,
-                    patch=1,
-                )
-            }
-            # Dry run
-            charmcraft.publish_charm_libraries(dry_run=True)
-            charmcraft_mock.assert_not_called()
-            # Actual run
-            charmcraft.publish_charm_libraries(dry_run=False)
-            charmcraft_mock.assert_has_calls(
-                [
-                    call(
-                        "publish-lib",
-                        "charms.blackbox_exporter_k8s.v0.blackbox_probes",
-                        format="json",
-                        _tty_out=False,
-                    )
-                ]
+    with ExitStack() as stack:
+        locals_mock = stack.enter_context(
+            patch("services.charmcraft.local_charm_libraries", MagicMock())
+        )
+        charmcraft_mock = stack.enter_context(patch("sh.charmcraft", Mock(spec=[]), create=True))
+        charmcraft_mock.return_value.stdout = '{"error_message": null}'
+        locals_mock.return_value = {
+            "charms.catalogue_k8s.v0.catalogue": charmcraft.CharmLibrary(
+                charm_name="catalogue-k8s", library_name="catalogue", api=0, patch=10
             )
-            # Error messages
-            charmcraft_mock.return_value = '{"error_message": "is already updated"}'
-            charmcraft.publish_charm_libraries(dry_run=False)
-            assert charmcraft_mock.call_count == 2
-            for message in [
-                "is the same than in Charmhub but content is different",
-                "LIBPATCH number was incorrectly incremented",
-                "has a wrong LIBPATCH number, it's too high",
-            ]:
-                charmcraft_mock.return_value = '{"error_message": "' + message + '"}'
-                with pytest.raises(charmcraft.CharmhubError):
-                    charmcraft.publish_charm_libraries()
+        }
+        charmcraft.publish_charm_libraries(dry_run=False)
+        # Charm is blackbox, libraries are catalogue: check no calls are made
+        charmcraft_mock.assert_not_called()
+        # Charm is blackbox
+        locals_mock.return_value = {
+            "charms.blackbox_exporter_k8s.v0.blackbox_probes": charmcraft.CharmLibrary(
+                charm_name="blackbox-exporter-k8s",
+                library_name="blackbox_probes",
+                api=0,
+                patch=1,
+            )
+        }
+        # Dry run
+        charmcraft.publish_charm_libraries(dry_run=True)
+        charmcraft_mock.assert_not_called()
+        # Actual run
+        charmcraft.publish_charm_libraries(dry_run=False)
+        charmcraft_mock.assert_has_calls(
+            [
+                call(
+                    "publish-lib",
+                    "charms.blackbox_exporter_k8s.v0.blackbox_probes",
+                    format="json",
+                    _tty_out=False,
+                    _return_cmd=True,
+                )
+            ]
+        )
+        # Error messages
+        charmcraft_mock.return_value.stdout = '{"error_message": "is already updated"}'
+        charmcraft.publish_charm_libraries(dry_run=False)
+        assert charmcraft_mock.call_count == 2
+        for message in [
+            "is the same than in Charmhub but content is different",
+            "LIBPATCH number was incorrectly incremented",
+            "has a wrong LIBPATCH number, it's too high",
+        ]:
+            charmcraft_mock.return_value.stdout = '{"error_message": "' + message + '"}'
+            with pytest.raises(charmcraft.CharmhubError):
+                charmcraft.publish_charm_libraries()
 
 
 @patch("tempfile.TemporaryDirectory")
 @patch("os.unlink", MagicMock())
-@patch("sh.charmcraft", MagicMock(), create=True)
+@patch("sh.charmcraft", Mock(spec=["pack"]), create=True)
 def test_charmcraft_pack(tempfile_mock):
     tempfile_mock.return_value.__enter__.return_value = ""
     # charmcraft.yaml needs to be backed up
-    with patch("sh.cp", MagicMock(), create=True) as cp_mock:
+    with patch("shutil.copy", Mock()) as copy_mock:
         with patch("os.path.exists", MagicMock(return_value=True)):
             charmcraft.pack("charmcraft.yaml")
-            # assert cp_mock.call_count == 2 # backup and restore
+            # assert copy_mock.call_count == 2 # backup and restore
             calls = [
                 call("charmcraft.yaml", "charmcraft.yaml.bak"),
                 call("charmcraft.yaml.bak", "charmcraft.yaml"),
             ]
-            cp_mock.assert_has_calls(calls)
+            copy_mock.assert_has_calls(calls)
             charmcraft.pack("charmcraft-22.04.yaml")
             calls.append(call("charmcraft.yaml", "charmcraft.yaml.bak"))
             calls.append(call("charmcraft-22.04.yaml", "charmcraft.yaml"))
             calls.append(call("charmcraft.yaml.bak", "charmcraft.yaml"))
-            cp_mock.assert_has_calls(calls)
+            copy_mock.assert_has_calls(calls)
         with patch("os.path.exists", MagicMock(return_value=False)):
             charmcraft.pack("charmcraft-22.04.yaml")
             calls.append(call("charmcraft-22.04.yaml", "charmcraft.yaml"))
-            cp_mock.assert_has_calls(calls)
+            copy_mock.assert_has_calls(calls)
@@ -1,9 +1,15 @@
-from unittest.mock import MagicMock, mock_open, patch
+import dataclasses
+import json
+from types import MappingProxyType
+from typing import Iterator, Mapping
+from unittest.mock import Mock, patch
 
 import pytest
 
 import services.charmcraft as charmcraft
-import tests.constants as constants
+
+# A read-only empty mapping, shared by the objects built without any item
+_EMPTY: Mapping = MappingProxyType({})
 
 
 @pytest.mark.parametrize(
@@ -32,53 +38,71 @@ def test_charm_library_full_name(charm_library, expected):
     [
         ("lib/charms/traefik_k8s/v2/ingress.py", "2.14"),
         ("lib/charms/prometheus_k8s/v0/prometheus_scrape.py", "0.47"),
-        ("lib/charms/wrong/v0/library.py", None),  # has content in constants.py
+        ("lib/charms/wrong/v0/library.py", None),  # has content in tests/fixtures
     ],
 )
+@pytest.mark.usefixtures("fake_files")
 def test_charm_library_from_file(filename, expected):
-    with patch(
-        "builtins.open",
-        new_callable=mock_open,
-        read_data=constants.CHARM_LIBRARIES[filename],
-    ):
-        if expected is None:
-            with pytest.raises(charmcraft.InputError):
-                charmcraft.CharmLibrary.from_file(filename)
-            return
-        library = charmcraft.CharmLibrary.from_file(filename)
-        version = f"{library.api}.{library.patch}"
-        assert version == expected
+    if expected is None:
+        with pytest.raises(charmcraft.InputError):
+            charmcraft.CharmLibrary.from_file(filename)
+        return
+    library = charmcraft.CharmLibrary.from_file(filename)
+    version = f"{library.api}.{library.patch}"
+    assert version == expected
+
+
+def test_charm_library_from_file_metadata_after_head(tmp_path, monkeypatch):
+    filename = "lib/charms/loki_k8s/v1/loki_push_api.py"
+    (tmp_path / filename).parent.mkdir(parents=True)
+    (tmp_path / filename).write_text("LIBAPI = 1\n" + "# padding\n" * 1000 + "LIBPATCH = 3\n")
+    monkeypatch.chdir(tmp_path)
+    library = charmcraft.CharmLibrary.from_file(filename)
+    assert (library.api, library.patch) == (1, 3)
 
 
 @pytest.mark.parametrize(
-    "filename",
+    "in_head, after_head",
     [
-        "some/wrong/path/to/file.py",
-        "lib/charms/some/wrong/path.py",
+        ("LIBPATCH = 1", "2\n"),  # the value is cut by the end of the head
+        ("LIBPATCH = 12", "\n"),  # the value ends right at the end of the head
     ],
 )
-def test_charm_library_from_file_failures(
-    filename,
-):
-    with pytest.raises(charmcraft.InputError):
-        charmcraft.CharmLibrary.from_file(filename)
-    return
+def test_charm_library_from_file_metadata_across_head(tmp_path, monkeypatch, in_head, after_head):
+    filename = "lib/charms/loki_k8s/v1/loki_push_api.py"
+    head = "LIBAPI = 1\n"
+    head += "#" * (charmcraft._LIB_META_HEAD_SIZE - len(head) - len(in_head) - 1) + "\n"
+    assert len(head + in_head) == charmcraft._LIB_META_HEAD_SIZE
+    (tmp_path / filename).parent.mkdir(parents=True)
+    (tmp_path / filename).write_text(head + in_head + after_head)
+    monkeypatch.chdir(tmp_path)
+    library = charmcraft.CharmLibrary.from_file(filename)
+    assert (library.api, library.patch) == (1, 12)
+
+
+def test_charm_library_from_file_failures():
+    for filename in ("some/wrong/path/to/file.py", "lib/charms/some/wrong/path.py"):
+        with pytest.raises(charmcraft.InputError):
+            charmcraft.CharmLibrary.from_file(filename)
+
+
+@pytest.fixture
+def charmhub(charmcraft_list_lib_json) -> Iterator[Mock]:
+    """Patch `sh.charmcraft` during a test, to list the libraries of the requested charm."""
+
+    def list_lib(command: str, charm_name: str, **kwargs) -> Mock:
+        return Mock(stdout=charmcraft_list_lib_json[charm_name])
+
+    with patch("sh.charmcraft", Mock(spec=[], side_effect=list_lib), create=True) as mock:
+        yield mock
 
 
 @pytest.mark.parametrize("charm_name", ["catalogue-k8s", "grafana-k8s", "prometheus-k8s"])
-def test_charm_library_from_charmhub(charm_name):
-    with patch("sh.charmcraft", MagicMock(return_value=constants.CHARMCRAFT_LIST_LIB[charm_name])):
-        libraries = charmcraft.CharmLibrary.from_charmhub(charm_name)
-        for full_name, library in libraries.items():
-            for expected in constants.CHARMCRAFT_LIST_LIB_EXPECTED[charm_name]:
-                if full_name != expected.full_name:
-                    continue
-                assert library.full_name == full_name
-                assert library.charm_name == expected.charm_name
-                assert library.api == expected.api
-                assert library.patch == expected.patch
-                assert library.library_id is not None
-                assert library.content_hash is not None
+@pytest.mark.usefixtures("charmhub")
+def test_charm_library_from_charmhub(charm_name, charmcraft_list_lib_expected):
+    charmcraft.CharmLibrary.from_charmhub.cache_clear()
+    libraries = charmcraft.CharmLibrary.from_charmhub(charm_name)
+    assert libraries == {lib.full_name: lib for lib in charmcraft_list_lib_expected[charm_name]}
 
 
 @pytest.mark.parametrize(
@@ -89,17 +113,14 @@ def test_charm_library_from_charmhub(charm_name):
         ("prometheus-k8s", "prometheus_scrape"),
     ],
 )
-def test_charm_library_from_charmhub_with_name(charm_name, library_name):
-    with patch("sh.charmcraft", MagicMock(return_value=constants.CHARMCRAFT_LIST_LIB[charm_name])):
-        library = charmcraft.CharmLibrary.from_charmhub_with_name(charm_name, library_name)
-        for expected in constants.CHARMCRAFT_LIST_LIB_EXPECTED[charm_name]:
-            if library.full_name != expected.full_name:
-                continue
-            assert library.charm_name == expected.charm_name
-            assert library.api == expected.api
-            assert library.patch == expected.patch
-            assert library.library_id is not None
-            assert library.content_hash is not None
+@pytest.mark.usefixtures("charmhub")
+def test_charm_library_from_charmhub_with_name(
+    charm_name, library_name, charmcraft_list_lib_expected
+):
+    charmcraft.CharmLibrary.from_charmhub.cache_clear()
+    library = charmcraft.CharmLibrary.from_charmhub_with_name(charm_name, library_name)
+    assert library.library_name == library_name
+    assert library in charmcraft_list_lib_expected[charm_name]
 
 
 @pytest.mark.parametrize(
@@ -110,43 +131,47 @@ def test_charm_library_from_charmhub_with_name(charm_name, library_name):
         ("prometheus-k8s", "wrong-wrong-wrong"),
     ],
 )
+@pytest.mark.usefixtures("charmhub")
 def test_charm_library_from_charmhub_with_name_failures(charm_name, library_name):
-    with patch("sh.charmcraft", MagicMock(return_value=constants.CHARMCRAFT_LIST_LIB[charm_name])):
-        with pytest.raises(charmcraft.CharmhubError):
-            charmcraft.CharmLibrary.from_charmhub_with_name(charm_name, library_name)
+    charmcraft.CharmLibrary.from_charmhub.cache_clear()
+    with pytest.raises(charmcraft.CharmhubError):
+        charmcraft.CharmLibrary.from_charmhub_with_name(charm_name, library_name)
+
+
+# (channel, expected track, expected risk, expected next risk); None when they can't be parsed
+CHARM_CHANNEL_CASES = (
+    ("latest/edge", "latest", "edge", "beta"),
+    ("1.0/beta", "1.0", "beta", "candidate"),
+    ("2024/candidate", "2024", "candidate", "stable"),
+    ("3.x/stable", "3.x", "stable", "stable"),
+    ("latest/wrong", None, None, None),
+    ("/notrack", None, None, None),
+    ("nochannel/", None, None, None),
+    ("onlystring", None, None, None),
+    ("too/many/slashes", None, None, None),
+    ("too/many/slashes/here", None, None, None),
+)
 
 
-@pytest.mark.parametrize(
-    "channel, expected_track, expected_risk, expected_next_risk",
-    [
-        ("latest/edge", "latest", "edge", "beta"),
-        ("1.0/beta", "1.0", "beta", "candidate"),
-        ("2024/candidate", "2024", "candidate", "stable"),
-        ("3.x/stable", "3.x", "stable", "stable"),
-        ("latest/wrong", None, None, None),
-        ("/notrack", None, None, None),
-        ("nochannel/", None, None, None),
-        ("onlystring", None, None, None),
-        ("too/many/slashes", None, None, None),
-        ("too/many/slashes/here", None, None, None),
-    ],
-)
-def test_charm_channel(channel, expected_track, expected_risk, expected_next_risk):
-    charm_channel = charmcraft.CharmChannel(name=channel)
-    if expected_track is not None and expected_risk is not None:
-        assert charm_channel.track == expected_track
-        assert charm_channel.risk == expected_risk
-        if expected_next_risk is not None:
-            assert charm_channel.next_risk_channel.track == expected_track
-            assert charm_channel.next_risk_channel.risk == expected_next_risk
-        else:
+def test_charm_channel():
+    # The cases are cheap to check, so they run in a single test; the channel is in each assert
+    for channel, expected_track, expected_risk, expected_next_risk in CHARM_CHANNEL_CASES:
+        charm_channel = charmcraft.CharmChannel(name=channel)
+        if expected_track is None or expected_risk is None:
+            with pytest.raises(charmcraft.InputError):
+                charm_channel.track
+            with pytest.raises(charmcraft.InputError):
+                charm_channel.risk
+            continue
+        parsed = (channel, charm_channel.track, charm_channel.risk)
+        assert parsed == (channel, expected_track, expected_risk)
+        if expected_next_risk is None:
             with pytest.raises(charmcraft.InputError):
                 charm_channel.next_risk_channel
-    else:
-        with pytest.raises(charmcraft.InputError):
-            charm_channel.track
-        with pytest.raises(charmcraft.InputError):
-            charm_channel.risk
+            continue
+        next_channel = charm_channel.next_risk_channel
+        next_parsed = (channel, next_channel.track, next_channel.risk)
+        assert next_parsed == (channel, expected_track, expected_next_risk)
 
 
 @pytest.mark.parametrize(
@@ -154,5 +179,30 @@ def test_charm_channel(channel, expected_track, expected_risk, expected_next_ris
     [("20.04", "amd64", "20.04/amd64"), ("22.04", "arm64", "22.04/arm64")],
 )
 def test_base_status_name(version, arch, expected):
-    base_status = charmcraft.BaseStatus(version=version, arch=arch, channels={})
+    base_status = charmcraft.BaseStatus(version=version, arch=arch, channels=_EMPTY)
     assert base_status.name == expected
+
+
+@pytest.mark.parametrize(
+    "resource, expected",
+    [
+        (charmcraft.CharmResource(name="image"), {"name": "image"}),
+        (charmcraft.CharmResource(name="image", revision=0), {"name": "image", "revision": 0}),
+        (
+            charmcraft.CharmResource(name="image", revision=3, upstream_source="ubuntu/loki"),
+            {"name": "image", "revision": 3, "upstream_source": "ubuntu/loki"},
+        ),
+    ],
+)
+def test_charm_resource_to_dict(resource, expected):
+    assert resource.to_dict() == expected
+    upload = charmcraft.CharmUpload(name="some-charm", revision=1, resources=[resource])
+    assert json.loads(str(upload))["resources"] == [expected]
+
+
+def test_charm_resource_frozen():
+    resource = charmcraft.CharmResource(name="some-image", revision=1)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        resource.revision = 2  # pyright: ignore[reportAttributeAccessIssue]
+    # Equal resources can be shared, e.g. as dictionary keys
+    assert {resource: 1}[charmcraft.CharmResource(name="some-image", revision=1)] == 1
@@ -0,0 +1,69 @@
+import json
+from unittest.mock import Mock, call, patch
+
+import pytest
+
+import _fast_cli
+import services.charmcraft as charmcraft
+import services.github as github
+from _ui import json_default
+
+LIBRARIES = {
+    "charms.catalogue_k8s.v1.catalogue": charmcraft.CharmLibrary(
+        charm_name="catalogue-k8s", library_name="catalogue", api=1, patch=0
+    )
+}
+CI_STATUS = {
+    "loki-k8s-operator": [
+        github.WorkflowStatus(name="release.yaml", status="success", url="url"),
+    ]
+}
+
+
+@pytest.mark.parametrize(
+    "argv, service, result, expected_call",
+    [
+        (
+            ["charm", "libraries", "check", "--minor", "--json"],
+            "services.charmcraft.outdated_charm_libraries",
+            LIBRARIES,
+            call(minor=True, major=False),
+        ),
+        (
+            ["charm", "libraries", "print", "--json"],
+            "services.charmcraft.local_charm_libraries",
+            LIBRARIES,
+            call(),
+        ),
+        (
+            ["report", "ci", "--json"],
+            "services.github.team_ci_status",
+            CI_STATUS,
+            call("observability"),  # The default team
+        ),
+    ],
+)
+def test_main(capsys, argv, service, result, expected_call):
+    with patch(service, Mock(return_value=result)) as service_mock:
+        assert _fast_cli.main(argv)
+    assert service_mock.call_args_list == [expected_call]
+    # The output is the same as the one of the Typer commands
+    assert capsys.readouterr().out == json.dumps(result, default=json_default) + "\n"
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["charm", "libraries", "print"],  # Not a '--json' invocation
+        ["charm", "libraries", "check", "--json"],  # Neither '--minor' nor '--major'
+        ["charm", "libraries", "check", "--patch", "--json"],  # Unknown option
+        ["rock", "test", "--json"],  # Command not supported by the fast path
+    ],
+)
+def test_main_fallback(capsys, argv):
+    with patch("services.charmcraft.outdated_charm_libraries") as outdated_mock:
+        with patch("services.charmcraft.local_charm_libraries") as local_mock:
+            assert not _fast_cli.main(argv)
+    outdated_mock.assert_not_called()
+    local_mock.assert_not_called()
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,113 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+import sh
+
+import services.github as github
+import tests.constants as constants
+
+
+@pytest.mark.parametrize(
+    "repo, expected",
+    [
+        ("canonical/blackbox-exporter-k8s-operator", ["release.yaml"]),
+        (
+            "canonical/alertmanager-rock",
+            ["rock-release-oci-factory.yaml", "rock-release-dev.yaml", "rock-update.yaml"],
+        ),
+    ],
+)
+def test_workflows_in_readme(repo, expected):
+    with patch("sh.gh", MagicMock(), create=True) as gh_mock:
+        gh_mock.repo.view.return_value.stdout = constants.readme(repo)
+        github_repo = github.GithubRepo(full_name=repo)
+        assert github_repo.workflows_in_readme == expected
+        assert github_repo.workflows_in_readme == expected
+        gh_mock.repo.view.assert_called_once()
+
+
+def test_readme_concurrent_fetches():
+    # Both fetches must be in flight at the same time for the barrier to let them through
+    barrier = threading.Barrier(2, timeout=5)
+
+    def view(full_name, **kwargs):
+        barrier.wait()
+        return MagicMock(stdout=full_name.encode())
+
+    repos = [github.GithubRepo(full_name=f"canonical/repo-{i}") for i in range(2)]
+    with patch("sh.gh", MagicMock(), create=True) as gh_mock:
+        gh_mock.repo.view.side_effect = view
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            readmes = list(executor.map(lambda repo: repo.readme, repos))
+    assert readmes == [b"canonical/repo-0", b"canonical/repo-1"]
+
+
+def test_workflows_in_readme_other_repo():
+    readme = constants.readme("canonical/alertmanager-rock")
+    with patch("sh.gh", MagicMock(), create=True) as gh_mock:
+        gh_mock.repo.view.return_value.stdout = readme
+        github_repo = github.GithubRepo(full_name="canonical/alertmanager-k8s-operator")
+        assert github_repo.workflows_in_readme == []
+
+
+# A run as returned by the GitHub API, and as summarized by `recent_workflow_runs`
+API_RUN = {"conclusion": "success", "status": "completed", "html_url": "url"}
+RUN = {"conclusion": "success", "status": "completed", "url": "url"}
+
+
+def test_workflow_status():
+    recent_runs = {"release.yaml": {"conclusion": "success", "status": "completed", "url": "url"}}
+    workflow_files = {"release.yaml", "pull-request.yaml"}
+    with patch("sh.gh", MagicMock(), create=True) as gh_mock:
+        gh_mock.run.list.return_value.stdout = "[]"
+        repo = github.GithubRepo(full_name="canonical/loki-k8s-operator")
+        # Workflows with recent runs are reported without further calls
+        status = repo.workflow_status("release.yaml", recent_runs, workflow_files)
+        assert status == github.WorkflowStatus(name="release.yaml", status="success", url="url")
+        # Workflows that don't exist anymore are reported without listing their runs
+        status = repo.workflow_status("removed.yaml", recent_runs, workflow_files)
+        assert status == github.WorkflowStatus(name="removed.yaml", status="missing")
+        gh_mock.run.list.assert_not_called()
+        # The other workflows fall back to 'gh run list'
+        status = repo.workflow_status("pull-request.yaml", recent_runs, workflow_files)
+        assert status == github.WorkflowStatus(name="pull-request.yaml", status="no runs")
+        gh_mock.run.list.assert_called_once()
+        # Without the workflow files, no workflow is assumed to be missing
+        status = repo.workflow_status("removed.yaml", recent_runs)
+        assert status == github.WorkflowStatus(name="removed.yaml", status="no runs")
+        gh_mock.api.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "runs_error, files_error, expected_runs, expected_files",
+    [
+        (False, False, {"release.yaml": RUN}, None),  # All the workflows have recent runs
+        (True, False, {}, {"release.yaml"}),
+        (False, True, {"release.yaml": RUN}, None),
+        (True, True, {}, None),  # e.g., rate limited: each workflow is looked up instead
+    ],
+)
+def test_workflows_and_runs(runs_error, files_error, expected_runs, expected_files):
+    readme = constants.readme("canonical/blackbox-exporter-k8s-operator")
+    runs = {"workflow_runs": [{"path": ".github/workflows/release.yaml", **API_RUN}]}
+    files = {"workflows": [{"path": ".github/workflows/release.yaml"}]}
+    error = sh.ErrorReturnCode_1("gh api", b"", b"HTTP 403: API rate limit exceeded")
+
+    def api(endpoint, **kwargs):
+        if "/actions/runs" in endpoint:
+            if runs_error:
+                raise error
+            return MagicMock(stdout=json.dumps(runs))
+        if files_error:
+            raise error
+        return MagicMock(stdout=json.dumps(files))
+
+    with patch("sh.gh", MagicMock(), create=True) as gh_mock:
+        gh_mock.repo.view.return_value.stdout = readme
+        gh_mock.api.side_effect = api
+        repo = github.GithubRepo(full_name="canonical/blackbox-exporter-k8s-operator")
+        workflows_and_runs = github._workflows_and_runs(repo)
+    assert workflows_and_runs == (["release.yaml"], expected_runs, expected_files)
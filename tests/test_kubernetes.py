@@ -0,0 +1,123 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import services.kubernetes as kubernetes
+
+
+def _pod(phase: str) -> MagicMock:
+    pod = MagicMock()
+    pod.status.phase = phase
+    return pod
+
+
+@pytest.mark.parametrize(
+    "listed_phases, watched_phases, watched",
+    [
+        (["Running"], [], False),  # Already running, no need to watch
+        ([], ["Pending", "Running"], True),
+        (["Pending"], ["Pending", "Pending", "Running"], True),
+    ],
+)
+@patch("kubernetes.watch.Watch")
+@patch("services.kubernetes._api")
+def test_wait_for_pod(api_mock, watch_mock, listed_phases, watched_phases, watched):
+    api_mock.return_value.list_namespaced_pod.return_value.items = [
+        _pod(phase) for phase in listed_phases
+    ]
+    watch_mock.return_value.stream.return_value = [
+        {"type": "MODIFIED", "object": _pod(phase)} for phase in watched_phases
+    ]
+    kubernetes._wait_for_pod(pod="some-pod", namespace="default")
+    # The initial read is served from the API server cache
+    api_mock.return_value.list_namespaced_pod.assert_called_once_with(
+        "default", field_selector="metadata.name=some-pod", resource_version="0"
+    )
+    assert watch_mock.return_value.stream.called == watched
+    assert watch_mock.return_value.stop.called == watched
+
+
+@pytest.mark.parametrize("watched_phases", [["Pending"], ["Pending", "Failed"]])
+@patch("kubernetes.watch.Watch")
+@patch("services.kubernetes._api")
+def test_wait_for_pod_failures(api_mock, watch_mock, watched_phases):
+    api_mock.return_value.list_namespaced_pod.return_value.items = []
+    watch_mock.return_value.stream.return_value = [
+        {"type": "MODIFIED", "object": _pod(phase)} for phase in watched_phases
+    ]
+    with pytest.raises(kubernetes.KubernetesError):
+        kubernetes._wait_for_pod(pod="some-pod", namespace="default")
+
+
+@pytest.mark.parametrize(
+    "watched_types, deleted",
+    [
+        (["MODIFIED", "DELETED"], True),
+        (["MODIFIED"], False),  # Still terminating when the watch times out
+    ],
+)
+@patch("kubernetes.watch.Watch")
+@patch("services.kubernetes._api")
+def test_stop(api_mock, watch_mock, watched_types, deleted):
+    api_mock.return_value.delete_namespaced_pod.return_value.metadata.resource_version = "42"
+    watch_mock.return_value.stream.return_value = [
+        {"type": event_type, "object": _pod("Running")} for event_type in watched_types
+    ]
+    if not deleted:
+        with pytest.raises(kubernetes.KubernetesError):
+            kubernetes.stop(pod="some-pod", namespace="default")
+        return
+    kubernetes.stop(pod="some-pod", namespace="default")
+    api_mock.return_value.delete_namespaced_pod.assert_called_once_with("some-pod", "default")
+    # The pod is watched from its deletion until it's gone
+    assert watch_mock.return_value.stream.call_args.kwargs["resource_version"] == "42"
+    watch_mock.return_value.stop.assert_called_once()
+
+
+@pytest.mark.parametrize("data, exists", [(b'{"items": []}', False), (b'{"items": [{}]}', True)])
+@patch("services.kubernetes._api")
+def test_pod_exists(api_mock, data, exists):
+    api_mock.return_value.list_namespaced_pod.return_value.data = data
+    assert kubernetes._pod_exists(pod="some-pod", namespace="default") == exists
+    api_mock.return_value.list_namespaced_pod.assert_called_once_with(
+        "default",
+        field_selector="metadata.name=some-pod",
+        limit=1,
+        resource_version="0",
+        _preload_content=False,
+    )
+
+
+@pytest.mark.parametrize("returncode", [0, 1])
+@patch("services.kubernetes.stream")
+@patch("services.kubernetes._api", MagicMock())
+@patch("services.kubernetes._wait_for_pod", MagicMock())
+def test_install_goss(stream_mock, returncode):
+    stream_mock.return_value.returncode = returncode
+    stream_mock.return_value.read_stdout.return_value = "already installed\n"
+    if returncode:
+        with pytest.raises(kubernetes.KubernetesError):
+            kubernetes.install_goss(pod="some-pod", namespace="default", arch="arm64")
+        return
+    kubernetes.install_goss(pod="some-pod", namespace="default", arch="arm64")
+    # All the installation steps run in a single exec session
+    stream_mock.assert_called_once()
+    command = stream_mock.call_args.kwargs["command"]
+    assert command[:2] == ["/bin/sh", "-c"]
+    assert "goss-linux-arm64" in command[2]
+
+
+@patch("services.kubernetes.stream")
+@patch("services.kubernetes._api", MagicMock())
+@patch("services.kubernetes._wait_for_pod", MagicMock())
+def test_install_goss_checks(stream_mock, tmp_path):
+    stream_mock.return_value.returncode = 0
+    checks = b"file:\n  /usr/bin/prometheus:\n    exists: true\n" * 5000  # Over a chunk
+    goss_path = tmp_path / "goss.yaml"
+    goss_path.write_bytes(checks)
+    kubernetes.install_goss_checks(pod="some-pod", namespace="default", path=str(goss_path))
+    assert stream_mock.call_args.kwargs["stdin"]
+    assert stream_mock.call_args.kwargs["command"][2] == f"head -c {len(checks)} > /goss.yaml"
+    written = [c.args[0] for c in stream_mock.return_value.write_stdin.call_args_list]
+    assert len(written) > 1
+    assert b"".join(written) == checks
@@ -1,6 +1,12 @@
-from datetime import datetime, timedelta
+import hashlib
+import io
+import json
+import tarfile
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from typing import Dict, List
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, Mock, patch
 
 import pytest
 import yaml
@@ -8,6 +14,9 @@ import yaml
 import services.rockcraft as rockcraft
 import tests.constants as constants
 
+# The C-accelerated YAML loader is much faster, but is only available when built with libyaml
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 @pytest.mark.parametrize(
     "folders, expected",
@@ -24,14 +33,21 @@ import tests.constants as constants
 )
 def test_local_tags(folders: List[str], expected: Dict[str, List[str]]):
     assert rockcraft.local_tags(folders) == expected
+
+
+def test_local_tags_failures():
     with pytest.raises(rockcraft.InputError):
         rockcraft.local_tags([])
     with pytest.raises(rockcraft.InputError):
         rockcraft.local_tags(["no-version", "here"])
 
 
-def test_oci_factory_tags():
-    with patch("requests.get", MagicMock()) as get_mock:
+def test_oci_factory_tags(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    rockcraft._oci_factory_tags.cache_clear()
+    with patch("services.rockcraft._github_session") as session_mock:
+        get_mock = session_mock.return_value.get
+        get_mock.return_value.headers = {}
         get_mock.return_value.status_code = 404
         assert rockcraft.oci_factory_tags("something") == []
         # Test '-rock' nor in the name
@@ -42,22 +58,104 @@ def test_oci_factory_tags():
 
         get_mock.return_value.status_code = 300
         with pytest.raises(rockcraft.GitHubError):
-            rockcraft.oci_factory_tags("something")
+            rockcraft.oci_factory_tags("other")
+
+        get_mock.return_value.status_code = 200
+        get_mock.return_value.content = constants.oci_factory_releases("prometheus")
+        assert rockcraft.oci_factory_tags("other") == ["2.45.0", "2.45"]
+        # The tags are only fetched once per rock
+        get_mock.reset_mock()
+        tags = rockcraft.oci_factory_tags("other")
+        tags.append("3.0")  # Callers get their own copy of the cached tags
+        assert rockcraft.oci_factory_tags("other") == ["2.45.0", "2.45"]
+        get_mock.assert_not_called()
+
+
+@pytest.fixture
+def unavailable_url():
+    """Serve '503 Service Unavailable' on a local URL, counting the requests."""
+    requests_count = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):  # noqa: N802
+            """Answer every request with a 503."""
+            requests_count.append(self.path)
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            """Don't log the requests to stderr."""
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/_releases.json", requests_count
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_revalidated_unavailable(tmp_path, monkeypatch, unavailable_url):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    url, requests_count = unavailable_url
+    # The production session, with its adapter (and retries) also used for plain HTTP
+    session = rockcraft._github_session.__wrapped__()
+    adapter = session.get_adapter("https://raw.githubusercontent.com")
+    adapter.max_retries = adapter.max_retries.new(backoff_factor=0)  # Don't slow the test down
+    session.mount("http://", adapter)
+    with patch("services.rockcraft._github_session", MagicMock(return_value=session)):
+        # The last response is returned once the retries are exhausted, instead of raising
+        assert rockcraft._get_revalidated(url) == (503, b"")
+    assert len(requests_count) == 4  # The request, and its 3 retries
+    with patch("services.rockcraft._get_revalidated", MagicMock(return_value=(503, b""))):
+        rockcraft._oci_factory_tags.cache_clear()
+        with pytest.raises(rockcraft.GitHubError):
+            rockcraft.oci_factory_tags("prometheus")
+
 
+def test_oci_factory_tags_not_modified(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    rockcraft._oci_factory_tags.cache_clear()
+    with patch("services.rockcraft._github_session") as session_mock:
+        get_mock = session_mock.return_value.get
         get_mock.return_value.status_code = 200
-        get_mock.return_value.text = constants.ROCKCRAFT_OCI_RELEASES["prometheus"]
-        assert rockcraft.oci_factory_tags("something") == ["2.45.0", "2.45"]
+        get_mock.return_value.headers = {"ETag": '"some-etag"'}
+        get_mock.return_value.content = constants.oci_factory_releases("prometheus")
+        assert rockcraft.oci_factory_tags("prometheus") == ["2.45.0", "2.45"]
+        get_mock.assert_called_once_with(ANY, headers={}, timeout=10)
+        # The cached body is used when OCI Factory reports it as not modified
+        get_mock.return_value.status_code = 304
+        get_mock.return_value.content = b""
+        rockcraft._oci_factory_tags.cache_clear()  # As in a new process
+        assert rockcraft.oci_factory_tags("prometheus") == ["2.45.0", "2.45"]
+        get_mock.assert_called_with(ANY, headers={"If-None-Match": '"some-etag"'}, timeout=10)
 
 
+def test_oci_factory_tags_batch():
+    tags = {"prometheus": ["2.45"], "grafana": [], "loki": ["3.0", "3.0.1"]}
+    with patch("services.rockcraft.oci_factory_tags", MagicMock(side_effect=tags.get)):
+        assert rockcraft.oci_factory_tags_batch(list(tags)) == tags
+
+
+# The manifests are generated on a fixed day, so their end-of-life dates are known
+_MANIFEST_NOW = datetime(2024, 1, 1, 12, 0)
+_END_OF_LIFE = "2024-04-01T00:00:00Z"  # 3 months later
+_END_OF_LIFE_PATCH = "2023-12-31T00:00:00Z"  # the day before
+
+
+@pytest.fixture
+def frozen_now():
+    """Make `services.rockcraft` read `_MANIFEST_NOW` as the current time."""
+    with patch("services.rockcraft.datetime", Mock(now=Mock(return_value=_MANIFEST_NOW))):
+        yield
+
+
+@pytest.mark.usefixtures("frozen_now")
 def test_oci_factory_manifest():
     repository = "canonical/prometheus-rock"
     commit = "abcdef123"
     versions_with_tags = {"1.0.0": ["1.0.0"], "1.0.1": ["1", "1.0", "1.0.1"]}
-    end_of_life_date = datetime.now() + timedelta(days=365 / 4)
-    end_of_life = f"{end_of_life_date.strftime('%Y-%m-%d')}T00:00:00Z"
-    end_of_life_patch_date = datetime.now() - timedelta(days=1)
-    end_of_life_patch = f"{end_of_life_patch_date.strftime('%Y-%m-%d')}T00:00:00Z"
-
+    end_of_life, end_of_life_patch = _END_OF_LIFE, _END_OF_LIFE_PATCH
     expected_manifest = {
         "version": 1,
         "upload": [
@@ -79,11 +177,139 @@ def test_oci_factory_manifest():
             },
         ],
     }
-    manifest: Dict = yaml.safe_load(
-        rockcraft.oci_factory_manifest(repository, commit, versions_with_tags)
-    )
+    manifest_yaml = rockcraft.oci_factory_manifest(repository, commit, versions_with_tags)
+    # OCI Factory expects the block sequences to be indented
+    assert "\n  - source: canonical/prometheus-rock\n" in manifest_yaml
+    assert "&" not in manifest_yaml  # no anchors for the shared release entries
+    manifest: Dict = yaml.load(manifest_yaml, Loader=_YAML_LOADER)
     # Make sure all the uploads point to the same repo and commit
     assert len({x["source"] for x in manifest["upload"]}) == 1  # pyright: ignore
     assert len({x["commit"] for x in manifest["upload"]}) == 1  # pyright: ignore
 
     assert manifest == expected_manifest
+
+
+class _CompliantDumper(yaml.SafeDumper):
+    """The dumper previously used for the manifests, to compare the emitted YAML with."""
+
+    def increase_indent(self, flow=False, indentless=False):
+        return super().increase_indent(flow, False)
+
+    def ignore_aliases(self, data):
+        return True
+
+
+@pytest.mark.parametrize(
+    "repository, versions_with_tags",
+    [
+        ("canonical/prometheus-rock", {"1.0.0": ["1.0.0"], "1.0.1": ["1", "1.0", "1.0.1"]}),
+        ("canonical/grafana-rock", {"10.0": ["10", "10.0"], "9.5.2": [], "2": ["latest"]}),
+        ("a repo: with #special chars", {"1.0": ["1.0-22.04", "yes", "0o17"]}),
+        ("canonical/loki-rock", {}),
+    ],
+)
+@pytest.mark.usefixtures("frozen_now")
+def test_oci_factory_manifest_matches_dumper(repository, versions_with_tags):
+    end_of_life, end_of_life_patch = _END_OF_LIFE, _END_OF_LIFE_PATCH
+    manifest = {
+        "version": 1,
+        "upload": [
+            {
+                "source": repository,
+                "commit": "0123abc",
+                "directory": version,
+                "release": {
+                    tag: {
+                        "end-of-life": end_of_life_patch
+                        if tag.partition("-")[0].count(".") == 2
+                        else end_of_life,
+                        "risks": ["stable"],
+                    }
+                    for tag in tags
+                },
+            }
+            for version, tags in versions_with_tags.items()
+        ],
+    }
+    manifest_yaml = rockcraft.oci_factory_manifest(repository, "0123abc", versions_with_tags)
+    dumped = yaml.dump(
+        manifest,
+        Dumper=_CompliantDumper,
+        default_flow_style=False,
+        sort_keys=False,
+        indent=2,
+    ).strip()
+    assert manifest_yaml == dumped
+
+
+def _oci_archive(path, blobs: Dict[str, bytes]) -> Dict[str, str]:
+    """Write an OCI archive with a config and a layer, returning the digests of its blobs."""
+    digests = {}
+    with tarfile.open(path, "w") as archive:
+
+        def add(name: str, data: bytes):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+        for name, data in blobs.items():
+            digests[name] = f"sha256:{hashlib.sha256(data).hexdigest()}"
+            add(f"blobs/sha256/{digests[name][7:]}", data)
+        manifest = json.dumps(
+            {
+                "config": {"digest": digests["config"]},
+                "layers": [{"digest": digests["layer"]}],
+            }
+        ).encode()
+        digests["manifest"] = f"sha256:{hashlib.sha256(manifest).hexdigest()}"
+        add(f"blobs/sha256/{digests['manifest'][7:]}", manifest)
+        media_type = "application/vnd.oci.image.manifest.v1+json"
+        index = {"manifests": [{"mediaType": media_type, "digest": digests["manifest"]}]}
+        add("index.json", json.dumps(index).encode())
+    return digests
+
+
+@patch("services.rockcraft._skopeo")
+@patch("services.rockcraft._registry_session")
+def test_push_to_registry(session_mock, skopeo_mock, tmp_path):
+    rock_path = tmp_path / "prometheus_2.45_amd64.rock"
+    digests = _oci_archive(rock_path, {"config": b"{}", "layer": b"layer"})
+    session = session_mock.return_value
+    # The config is already in the registry, the layer has to be uploaded
+    session.head.side_effect = lambda url: MagicMock(
+        status_code=200 if url.endswith(digests["config"]) else 404
+    )
+    session.post.return_value = MagicMock(
+        status_code=202,
+        url="http://localhost:32000/v2/prometheus/blobs/uploads/",
+        headers={"Location": "/v2/prometheus/blobs/uploads/1234"},
+    )
+    uploaded = {}
+
+    def put(url, data, **kwargs):
+        uploaded[url] = data if isinstance(data, bytes) else data.read()
+        return MagicMock(status_code=201)
+
+    session.put.side_effect = put
+
+    image_uri = rockcraft.push_to_registry(rock_path, "prometheus", "2.45")
+    assert image_uri == "localhost:32000/prometheus:2.45"
+    skopeo_mock.assert_not_called()
+    session.post.assert_called_once_with("http://localhost:32000/v2/prometheus/blobs/uploads/")
+    layer_upload, manifest_upload = session.put.call_args_list
+    assert layer_upload.args == ("http://localhost:32000/v2/prometheus/blobs/uploads/1234",)
+    assert layer_upload.kwargs["params"] == {"digest": digests["layer"]}
+    assert uploaded[layer_upload.args[0]] == b"layer"
+    assert manifest_upload.args == ("http://localhost:32000/v2/prometheus/manifests/2.45",)
+
+    session.put.side_effect = None
+    session.put.return_value = MagicMock(status_code=400)
+    with pytest.raises(rockcraft.RegistryError):
+        rockcraft.push_to_registry(rock_path, "prometheus", "2.45")
+
+    rockcraft.push_to_registry(rock_path, "prometheus", "2.45", registry="ghcr.io/canonical")
+    skopeo_mock.return_value.copy.assert_called_once_with(
+        f"oci-archive:{rock_path}",
+        "docker://ghcr.io/canonical/prometheus:2.45",
+        dest_tls_verify="false",
+    )